@@ -1,14 +1,22 @@
 import argparse
 import sys
-from .engine.audio_engine import AudioEngine
-from .patch.default_patches import DEFAULT_PATCHES
 
-# MIDI is optional — don't crash if mido/rtmidi aren't installed
-try:
-    from .midi.midi_input import MidiInput
-    _MIDI_AVAILABLE = True
-except ImportError:
-    _MIDI_AVAILABLE = False
+# --startup-profile has to be running before the imports it measures
+_profile = None
+if "--startup-profile" in sys.argv[1:]:
+    from .cli.startup import StartupProfile
+    _profile = StartupProfile()
+    _profile.start()
+
+from .config import (
+    SAMPLE_RATE, BUFFER_SIZE, LOOKAHEAD_BLOCKS, PRECISIONS, PRECISION, CULL_POLICIES, CULL_POLICY, CPU_BUDGET,
+    SILENCE_DB,
+)
+from .cli.render import add_render_parser
+from .cli.bench import add_bench_parser
+
+# Heavy modules (numpy/numba via the engine, mido, sounddevice, tkinter) are
+# imported by the code paths that use them, so --list-midi and --help stay fast.
 
 
 class _NullMidi:
@@ -31,12 +39,50 @@ def main():
     parser.add_argument("--patch", type=str, default=None, help="Default patch name to load")
     parser.add_argument("--no-midi", action="store_true", help="Start without MIDI")
     parser.add_argument("--gui", action="store_true", help="Launch graphical interface")
+    parser.add_argument("--lookahead", type=int, default=LOOKAHEAD_BLOCKS,
+                        help="Render this many blocks ahead on a separate thread (0 = in the callback)")
+    parser.add_argument("--precision", choices=PRECISIONS, default=PRECISION,
+                        help="Sample format of voice buffers and mixing")
+    parser.add_argument("--cull", choices=CULL_POLICIES, default=CULL_POLICY,
+                        help="Which voices to fade out when rendering runs over the CPU budget")
+    parser.add_argument("--cpu-budget", type=float, default=CPU_BUDGET,
+                        help="Fraction of each block's duration rendering may take before culling")
+    parser.add_argument("--silence-db", type=float, default=SILENCE_DB,
+                        help="Retire releasing voices quieter than this at the output (-inf: never)")
+    parser.add_argument("--startup-profile", action="store_true",
+                        help="Print an import-time breakdown once startup is done")
+    subparsers = parser.add_subparsers(dest="command")
+    add_render_parser(subparsers)
+    add_bench_parser(subparsers)
     args = parser.parse_args()
 
+    profile = _profile
+    if profile is not None:
+        profile.mark("parse arguments")
+
+    def startup_done(phase: str):
+        if profile is not None:
+            profile.mark(phase)
+            profile.stop()
+            print(profile.report())
+
+    if args.command == "render":
+        from .cli.render import run_render
+        run_render(args)
+        startup_done("render")
+        sys.exit(0)
+    if args.command == "bench":
+        from .cli.bench import run_bench
+        run_bench(args)
+        startup_done("bench")
+        sys.exit(0)
+
+    from .midi.midi_input import HAS_MIDO
     if args.list_midi:
-        if not _MIDI_AVAILABLE:
+        if not HAS_MIDO:
             print("MIDI support not available (install mido and python-rtmidi).")
             sys.exit(0)
+        from .midi.midi_input import MidiInput
         ports = MidiInput.list_ports()
         if ports:
             print("Available MIDI input ports:")
@@ -44,14 +90,24 @@ def main():
                 print(f"  [{i}] {p}")
         else:
             print("No MIDI input ports found.")
+        startup_done("list MIDI ports")
         sys.exit(0)
 
     # Create engine
-    engine = AudioEngine()
+    from .engine.audio_engine import AudioEngine
+    from .dsp.filter import BACKEND as FILTER_BACKEND, realtime_factor as filter_realtime_factor
+    from .patch.default_patches import DEFAULT_PATCHES
+    if profile is not None:
+        profile.mark("import engine")
+    engine = AudioEngine(lookahead=args.lookahead, precision=args.precision,
+                         cull_policy=args.cull, cpu_budget=args.cpu_budget, silence_db=args.silence_db)
+    if profile is not None:
+        profile.mark("create engine")
 
     # Create MIDI input (real or stub)
-    if _MIDI_AVAILABLE:
-        midi_input = MidiInput(engine.midi_queue)
+    if HAS_MIDO:
+        from .midi.midi_input import MidiInput
+        midi_input = MidiInput(engine.midi_ring)
     else:
         midi_input = _NullMidi()
         if not args.no_midi:
@@ -65,16 +121,27 @@ def main():
     else:
         print(f"Using default patch: {engine.channels[0].patch.name}")
 
+    # A few blocks, measured before audio starts so the callback does not compete with it
+    print(f"Filter backend: {FILTER_BACKEND} ({filter_realtime_factor(0.05):.0f}x realtime per voice)")
+    if profile is not None:
+        profile.mark("measure filter")
+
     # Start audio
     try:
         engine.start()
         print(f"Audio engine started (44100 Hz, buffer {engine._stream.blocksize})")
+        if args.lookahead > 0:
+            extra_ms = 1000.0 * args.lookahead * BUFFER_SIZE / SAMPLE_RATE
+            print(f"Lookahead: {args.lookahead} blocks (+{extra_ms:.1f} ms latency)")
     except Exception as e:
         print(f"Failed to start audio: {e}")
+        startup_done("start audio (failed)")
         sys.exit(1)
+    if profile is not None:
+        profile.mark("start audio")
 
     # Connect MIDI
-    if _MIDI_AVAILABLE and not args.no_midi:
+    if HAS_MIDO and not args.no_midi:
         ports = MidiInput.list_ports()
         if ports:
             port = args.midi_port if args.midi_port else ports[0]
@@ -86,6 +153,9 @@ def main():
         else:
             print("No MIDI ports found. Use 'midi open' in REPL when available.")
 
+    if profile is not None:
+        profile.mark("connect MIDI")
+
     if args.gui:
         try:
             from .gui.app import SynthGUI
@@ -100,6 +170,7 @@ def main():
             engine.stop()
             sys.exit(1)
         gui = SynthGUI(engine, midi_input)
+        startup_done("open GUI")
         try:
             gui.mainloop()
         except KeyboardInterrupt:
@@ -109,6 +180,7 @@ def main():
             engine.stop()
     else:
         from .cli.repl import run_repl
+        startup_done("load REPL")
         print("Type 'help' for commands, 'quit' to exit.\n")
         try:
             run_repl(engine, midi_input)
@@ -0,0 +1,26 @@
+from ..config import BUFFER_SIZE, PRECISIONS, PRECISION
+
+# `python -m synth bench <name>` runs benchmarks.bench_<name>. That module
+# (numpy, the engine) is only imported once a benchmark runs, so registering
+# the subcommand keeps startup light
+BENCHMARKS = ("alloc", "allocator", "cull", "envelope", "exp2", "filter", "modes", "parallel", "params",
+              "precision", "silence", "stages", "timing")
+
+
+def run_bench(args):
+    from . import benchmarks
+    getattr(benchmarks, f"bench_{args.name}")(args)
+
+
+def add_bench_parser(subparsers):
+    p = subparsers.add_parser("bench", help="Run a performance benchmark")
+    p.add_argument("name", choices=BENCHMARKS, help="Benchmark to run")
+    p.add_argument("--patch", type=str, default=None, help="Only this preset (default: all)")
+    p.add_argument("--voices", type=int, default=8, help="Polyphony / notes in the test chord")
+    p.add_argument("--duration", type=float, default=2.0, help="Seconds rendered per case")
+    p.add_argument("--modes", type=str, default=None, help="Comma-separated render modes to compare")
+    p.add_argument("--workers", type=int, default=0, help="Highest worker count to try (default: CPU count)")
+    p.add_argument("--precision", choices=PRECISIONS, default=PRECISION, help="Sample format (alloc)")
+    p.add_argument("--block-size", type=int, default=BUFFER_SIZE, help="Samples per render block (precision, envelope)")
+    p.add_argument("--output", "-o", type=str, default=None, help="Write results as JSON (stages)")
+    return p
@@ -0,0 +1,571 @@
+import itertools
+import time
+from typing import TYPE_CHECKING
+import numpy as np
+from ..config import RENDER_MODES, BUFFER_SIZE
+from ..engine.profiler import StageProfiler
+from ..patch.default_patches import DEFAULT_PATCHES
+
+if TYPE_CHECKING:
+    from ..engine.audio_engine import AudioEngine
+
+# Transient heap one callback may use (bytes). Python objects peak near 5 KB
+# in voice mode and 3 KB in fused mode; gathering the voices' state into new
+# arrays every block goes over.
+TRANSIENT_BUDGET = 6144
+
+
+def _engine(**engine_kw) -> "AudioEngine":
+    """New AudioEngine; the engine (numba, wavetables) is only imported once a benchmark runs."""
+    from ..engine.audio_engine import AudioEngine
+    return AudioEngine(**engine_kw)
+
+
+def chord_events(n_notes: int, duration: float, channel: int = 0) -> list[tuple[float, dict]]:
+    """n_notes stacked from C2 upward, held for 70% of `duration` then released."""
+    events = []
+    for i in range(n_notes):
+        note = 36 + (i * 5) % 60
+        events.append((0.0, {"type": "note_on", "channel": channel, "note": note, "velocity": 100}))
+        events.append((duration * 0.7, {"type": "note_off", "channel": channel, "note": note, "velocity": 0}))
+    return events
+
+
+def _render(patch_name: str, events, duration: float, seed: int = 1, block_size: int = BUFFER_SIZE,
+            **engine_kw) -> tuple[np.ndarray, float]:
+    engine = _engine(seed=seed, **engine_kw)
+    engine.channels[0].set_patch(DEFAULT_PATCHES[patch_name].copy())
+    t0 = time.perf_counter()
+    out = engine.render_offline(events, duration, block_size=block_size)
+    return out, time.perf_counter() - t0
+
+
+def _max_diff(a: np.ndarray, b: np.ndarray) -> float:
+    """Largest sample difference; NaNs in the same places count as equal."""
+    return float(np.max(np.abs(np.nan_to_num(a) - np.nan_to_num(b))))
+
+
+def bench_modes(args):
+    """Realtime factor of each render mode, and its deviation from the per-voice path."""
+    modes = args.modes.split(",") if args.modes else list(RENDER_MODES)
+    events = chord_events(args.voices, args.duration)
+    print(f"{args.voices}-note chord, {args.duration:.1f} s, max_voices={args.voices}")
+    print(f"{'patch':16s}" + "".join(f"{m:>18s}" for m in modes))
+    for name in _patch_names(args):
+        ref = None
+        cells = []
+        for mode in modes:
+            out, elapsed = _render(name, events, args.duration, render_mode=mode, max_voices=args.voices)
+            if ref is None:
+                ref = out
+            cells.append(f"{args.duration / elapsed:7.1f}x {_max_diff(out, ref):8.1e}")
+        print(f"{name:16s}" + "".join(f"{c:>18s}" for c in cells))
+
+
+def bench_parallel(args):
+    """Four busy channels rendered with 0 (serial) and 1..N worker threads."""
+    import os
+    max_workers = args.workers or os.cpu_count() or 1
+    mode = args.modes or "fused"
+    name = args.patch or "Fat Unison"
+    events = []
+    for ch in range(4):
+        events += chord_events(args.voices, args.duration, channel=ch)
+    print(f"{name}, 4 channels x {args.voices} notes, {mode} mode, {os.cpu_count()} CPUs")
+    _render(name, chord_events(1, 0.1), 0.1, render_mode=mode)  # load/compile kernels first
+    base = None
+    for workers in range(0, max_workers + 1):
+        engine = _engine(render_mode=mode, max_voices=args.voices, render_workers=workers, seed=1)
+        for ch in engine.channels:
+            ch.set_patch(DEFAULT_PATCHES[name].copy())
+        t0 = time.perf_counter()
+        engine.render_offline(events, args.duration)
+        elapsed = time.perf_counter() - t0
+        engine.stop()
+        base = base or elapsed
+        label = "serial" if workers == 0 else f"{workers} worker{'s' if workers > 1 else ''}"
+        print(f"  {label:10s} {args.duration / elapsed:7.1f}x realtime  speedup {base / elapsed:4.2f}")
+
+
+def bench_timing(args):
+    """Onset accuracy and cost of sample-accurate event scheduling.
+
+    Short notes are scheduled at random, block-unaligned times; each onset is
+    the first non-silent sample after the scheduled time. Every wavetable
+    starts at zero phase value, so a note from a voice at rest shows up one
+    sample late; a reused voice whose ladder still holds state from its last
+    note sounds on the scheduled sample itself. Exits with status 1 when any
+    onset is outside those two. The cost is measured with a dense CC stream
+    and with note-offs for notes that do not sound; neither splits the block.
+    """
+    from ..config import SAMPLE_RATE
+    from ..patch.patch import ADSRParams
+    rng = np.random.default_rng(7)
+    n_notes = 40
+    spacing = 0.1
+    times = np.sort(np.arange(n_notes) * spacing + 0.02 + rng.uniform(0.0, 0.05, n_notes))
+    events = []
+    for t in times:
+        events.append((t, {"type": "note_on", "channel": 0, "note": 60, "velocity": 100}))
+        events.append((t + 0.005, {"type": "note_off", "channel": 0, "note": 60, "velocity": 0}))
+    duration = n_notes * spacing + 0.2
+
+    engine = _engine(render_mode=args.modes or "voice")
+    patch = DEFAULT_PATCHES["Init"].copy()
+    patch.amp_adsr = ADSRParams(attack=0.001, decay=0.1, sustain=1.0, release=0.001)
+    engine.channels[0].set_patch(patch)
+    out = engine.render_offline(events, duration)
+
+    errors = []
+    for t in times:
+        start = int(round(t * SAMPLE_RATE))
+        window = out[start - 64:start + 512]
+        onset = int(np.flatnonzero(window)[0]) - 64
+        errors.append(onset)
+    errors = np.array(errors)
+    print(f"{n_notes} notes at random offsets: onset error min {errors.min()} / max {errors.max()} samples "
+          f"(0 or 1: the note's first sample, silent from rest)")
+
+    steps = np.arange(int(args.duration / 0.0007)) * 0.0007
+    dense = [(t, {"type": "control_change", "channel": 0, "control": 74, "value": i % 128})
+             for i, t in enumerate(steps)]
+    offs = [(t, {"type": "note_off", "channel": 0, "note": 100, "velocity": 0}) for t in steps]
+    for label, evs in (("no events", []), ("CC every 0.7 ms", dense), ("idle note-off 0.7 ms", offs)):
+        _, elapsed = _render("Pad Strings", chord_events(4, args.duration) + evs, args.duration,
+                             render_mode=args.modes or "voice")
+        print(f"  Pad Strings, {label:20s} {args.duration / elapsed:6.1f}x realtime")
+    if errors.min() < 0 or errors.max() > 1:
+        raise SystemExit("onset error: notes do not start on their scheduled sample")
+
+
+def bench_stages(args):
+    """Per-stage DSP time of each preset (profiling enabled), optionally saved as JSON."""
+    mode = args.modes or "voice"
+    events = chord_events(args.voices, args.duration)
+    profiler = StageProfiler()
+    for name in _patch_names(args):
+        engine = _engine(render_mode=mode, max_voices=args.voices)
+        engine.profiler = profiler
+        engine.set_profiling(True)
+        engine.channels[0].set_patch(DEFAULT_PATCHES[name].copy())
+        engine.render_offline(events, args.duration)
+    print(f"{args.voices}-note chord, {args.duration:.1f} s per patch, {mode} mode")
+    print(profiler.table())
+    if args.output:
+        profiler.save(args.output)
+        print(f"Profile written to {args.output}")
+
+
+def bench_precision(args):
+    """float32 against float64 rendering: realtime factor and deviation per preset.
+
+    Both formats draw the same (double-precision) noise stream, so noise
+    presets are compared sample for sample too. Only the voice mode has a
+    float32 path; bank and fused compute in float64 either way.
+    """
+    mode = args.modes or "voice"
+    events = chord_events(args.voices, args.duration)
+    print(f"{args.voices}-note chord, {args.duration:.1f} s, {mode} mode, block {args.block_size}")
+    print(f"{'patch':16s} {'float64':>9s} {'float32':>9s} {'max error':>10s} {'dBFS':>7s}")
+    _render("Init", chord_events(1, 0.1), 0.1, render_mode=mode, precision="float32")  # compile kernels
+    for name in _patch_names(args):
+        out64, t64 = _render(name, events, args.duration, render_mode=mode, max_voices=args.voices,
+                             block_size=args.block_size)
+        out32, t32 = _render(name, events, args.duration, render_mode=mode, max_voices=args.voices,
+                             block_size=args.block_size, precision="float32")
+        err = _max_diff(out64, out32)
+        db = 20.0 * np.log10(err) if err > 0 else -np.inf
+        print(f"{name:16s} {args.duration / t64:8.1f}x {args.duration / t32:8.1f}x "
+              f"{err:10.1e} {db:7.1f}")
+
+
+def bench_envelope(args):
+    """Per-voice cost of one ADSR.render block, split by the envelope state at block start.
+
+    Every preset's amp and filter envelope plays one note: held for half of
+    --duration, then released for the other half.
+    """
+    from ..config import SAMPLE_RATE
+    from ..dsp.envelope import ADSR
+    block = args.block_size
+    n_blocks = int(args.duration * SAMPLE_RATE / block)
+    times: dict[str, list[int]] = {}
+    out = np.empty(block, dtype=np.float64)
+    for name in _patch_names(args):
+        patch = DEFAULT_PATCHES[name]
+        for params in (patch.amp_adsr, patch.filter_adsr):
+            for _ in range(5):
+                env = ADSR(params.attack, params.decay, params.sustain, params.release)
+                env.gate_on()
+                for i in range(n_blocks):
+                    if i == n_blocks // 2:
+                        env.gate_off()
+                    state = env.state_name
+                    t0 = time.perf_counter_ns()
+                    env.render(block, out)
+                    times.setdefault(state, []).append(time.perf_counter_ns() - t0)
+    print(f"ADSR.render, {block}-sample blocks, {args.duration:.1f} s notes "
+          f"(all presets, amp + filter envelopes)")
+    print(f"{'state':10s} {'blocks':>8s} {'mean':>9s} {'p50':>9s}")
+    total = []
+    for state in ("attack", "decay", "sustain", "release", "idle"):
+        ns = times.get(state)
+        if not ns:
+            continue
+        total += ns
+        print(f"{state:10s} {len(ns):8d} {np.mean(ns) / 1000:7.2f}us {np.median(ns) / 1000:7.2f}us")
+    print(f"{'all':10s} {len(total):8d} {np.mean(total) / 1000:7.2f}us {np.median(total) / 1000:7.2f}us")
+
+
+def _time_ns(fn, n_samples: int, runs: int = 20) -> float:
+    """Best time of fn() over `runs` calls, in ns per sample."""
+    best = float("inf")
+    for _ in range(runs):
+        t0 = time.perf_counter_ns()
+        fn()
+        best = min(best, time.perf_counter_ns() - t0)
+    return best / n_samples
+
+
+def bench_filter(args):
+    """Ladder filter cost per sample and error against the exact per-sample kernel.
+
+    A 110 Hz saw runs through the ladder as one --duration block, once with
+    a fixed cutoff and once swept exponentially (20 semitones up and down
+    four times a second, like a fast filter envelope), at three resonances.
+    It starts with the active backend and ends with realtime_factor(),
+    one voice's realtime factor with a swept cutoff.
+    """
+    from ..config import SAMPLE_RATE
+    from ..dsp.filter import (BACKEND, GAIN_TABLE, MATRIX_SIZE, _moog_ladder, _moog_ladder_process,
+                              realtime_factor)
+    sr = float(SAMPLE_RATE)
+    n = int(args.duration * SAMPLE_RATE)
+    t = np.arange(n)
+    saw = 2.0 * ((t * 110.0 / sr) % 1.0) - 1.0
+    sweep = 500.0 * 2.0 ** (20.0 / 12.0 * (0.5 - 0.5 * np.cos(2.0 * np.pi * 4.0 * t / sr)))
+    matrix = np.zeros(MATRIX_SIZE)
+    ref = np.empty(n)
+    out = np.empty(n)
+    runs = 20 if BACKEND == "numba" else 2  # the exact kernel is plain Python without numba
+    print(f"Filter backend: {BACKEND}")
+    print(f"110 Hz saw, {args.duration:.1f} s, {BACKEND} backend; ns per sample")
+    print(f"{'cutoff':10s} {'res':>5s} {'exact':>8s} {'new':>8s} {'max error':>10s} {'dB':>7s}")
+    for name, cutoff in (("constant", np.full(n, 1200.0)), ("swept", sweep)):
+        for resonance in (0.0, 0.5, 0.9):
+            def exact():
+                _moog_ladder_process(saw, cutoff, resonance, np.zeros(4), sr, ref)
+
+            def new():
+                _moog_ladder(saw, cutoff, resonance, np.zeros(4), sr, GAIN_TABLE, matrix, out)
+
+            t_ref = _time_ns(exact, n, runs)
+            t_new = _time_ns(new, n, runs)
+            err = _max_diff(out, ref)
+            db = 20.0 * np.log10(err / np.max(np.abs(ref))) if err > 0 else -np.inf
+            print(f"{name:10s} {resonance:5.2f} {t_ref:8.1f} {t_new:8.1f} {err:10.1e} {db:7.1f}")
+    print(f"MoogFilter, swept, {BUFFER_SIZE}-sample blocks: {realtime_factor():.0f}x realtime per voice")
+
+
+def bench_exp2(args):
+    """Cost and accuracy of semitones_to_ratio() against np.power(2, x / 12).
+
+    First per BUFFER_SIZE block of ±48 semitones in both precisions, with the
+    worst relative error against long-double 2 ** x; then the realtime
+    factor of each preset whose pitch or cutoff is modulated.
+    """
+    from ..dsp.exp2 import semitones_to_ratio
+    print(f"{BUFFER_SIZE}-sample block; us per block and max relative error over ±48 semitones")
+    print(f"{'dtype':8s} {'power':>8s} {'exp2':>8s} {'power err':>10s} {'exp2 err':>10s}")
+    for dtype in (np.float64, np.float32):
+        x = np.linspace(-48.0, 48.0, 100_001).astype(dtype)
+        exact = 2.0 ** (x.astype(np.longdouble) / 12.0)
+        err_pow = float(np.max(np.abs(np.power(dtype(2.0), x / dtype(12.0)) / exact - 1.0)))
+        err_new = float(np.max(np.abs(semitones_to_ratio(x) / exact - 1.0)))
+        block = x[:BUFFER_SIZE].copy()
+        out = np.empty_like(block)
+
+        def power():
+            for _ in range(100):
+                np.divide(block, 12.0, out=out)
+                np.power(2.0, out, out=out)
+
+        def new():
+            for _ in range(100):
+                semitones_to_ratio(block, 1.0, out)
+
+        t_pow = _time_ns(power, BUFFER_SIZE * 100) * BUFFER_SIZE / 1000.0
+        t_new = _time_ns(new, BUFFER_SIZE * 100) * BUFFER_SIZE / 1000.0
+        print(f"{np.dtype(dtype).name:8s} {t_pow:8.2f} {t_new:8.2f} {err_pow:10.1e} {err_new:10.1e}")
+
+    mode = args.modes or "voice"
+    events = chord_events(args.voices, args.duration)
+    print(f"\n{args.voices}-note chord, {args.duration:.1f} s, {mode} mode; modulated presets")
+    for name in _patch_names(args):
+        p = DEFAULT_PATCHES[name]
+        if not args.patch and p.filter.env_amount == 0.0 and not (
+                p.lfo.destination in ("pitch", "filter") and p.lfo.depth > 0):
+            continue
+        _, elapsed = _render(name, events, args.duration, render_mode=mode, max_voices=args.voices)
+        print(f"{name:16s} {args.duration / elapsed:7.1f}x realtime")
+
+
+def bench_allocator(args):
+    """Voice allocator cost at 8 to 128 voices per channel.
+
+    "free" is a note_on + note_off pair on a channel with spare voices,
+    "steal" a note_on on one whose voices all sound, so it steals the oldest.
+    "count" is active_voice_count() (the GUI polls it) and "idle" one block
+    of a silent channel, which is only the walk over its voices.
+    """
+    from ..engine.channel import Channel
+    print("us per call")
+    print(f"{'voices':>6s} {'free':>8s} {'steal':>8s} {'count':>8s} {'idle':>8s}")
+    for n in (8, 32, 64, 128):
+        idle = Channel(max_voices=n)
+        channel = Channel(max_voices=n)
+        allocator = channel.allocator
+
+        def free():
+            for k in range(100):
+                allocator.note_on(60 + k % 12, 100)
+                allocator.note_off(60 + k % 12)
+
+        def steal():
+            # Ever new note numbers (past 127 too), so every note_on steals
+            for _ in range(100):
+                allocator.note_on(next(notes), 100)
+
+        def count():
+            for _ in range(100):
+                allocator.active_voice_count()
+
+        t_free = _time_ns(free, 100) / 1000.0
+        notes = itertools.count(n)
+        for i in range(n):
+            allocator.note_on(i, 100)
+        t_steal = _time_ns(steal, 100) / 1000.0
+        t_count = _time_ns(count, 100) / 1000.0
+        t_idle = _time_ns(lambda: idle.render(BUFFER_SIZE), 1) / 1000.0
+        print(f"{n:6d} {t_free:8.2f} {t_steal:8.2f} {t_count:8.3f} {t_idle:8.2f}")
+
+
+def bench_params(args):
+    """Cost of a parameter change and of a note at 8 to 128 voices per channel.
+
+    "cutoff" and "detune" are set_param() calls as a CC message or a GUI
+    knob makes them ("filter.cutoff", "osc2.detune"), "note" a note_on +
+    note_off pair through the channel.
+    """
+    from ..engine.channel import Channel
+    print("us per call")
+    print(f"{'voices':>6s} {'cutoff':>8s} {'detune':>8s} {'note':>8s}")
+    for n in (8, 32, 64, 128):
+        channel = Channel(max_voices=n)
+        channel.set_patch(DEFAULT_PATCHES["Pad Strings"].copy())
+
+        def cc(param, lo, hi):
+            def run():
+                for k in range(100):
+                    channel.set_param(param, lo + (hi - lo) * (k % 128) / 127.0)
+            return run
+
+        def note():
+            for k in range(100):
+                channel.note_on(60 + k % 12, 100)
+                channel.note_off(60 + k % 12)
+
+        t_cutoff = _time_ns(cc("filter.cutoff", 20.0, 20000.0), 100) / 1000.0
+        t_detune = _time_ns(cc("osc2.detune", -50.0, 50.0), 100) / 1000.0
+        t_note = _time_ns(note, 100) / 1000.0
+        print(f"{n:6d} {t_cutoff:8.2f} {t_detune:8.2f} {t_note:8.2f}")
+
+
+def bench_cull(args):
+    """Live rendering under overload with each cull policy.
+
+    Every channel plays --patch (default Pad Strings) with --voices voices: a
+    new note every 40 ms, each held for 0.4 s, so releasing voices pile up.
+    Blocks go through the live render path (as in the audio callback, but
+    back to back) for --duration seconds. "voices" is the mean number
+    sounding.
+    """
+    from ..config import CULL_POLICIES, CPU_BUDGET, NUM_CHANNELS, SAMPLE_RATE
+    name = args.patch or "Pad Strings"
+    n_blocks = int(args.duration * SAMPLE_RATE / BUFFER_SIZE)
+    step = max(1, int(0.04 * SAMPLE_RATE / BUFFER_SIZE))
+    hold = int(0.4 * SAMPLE_RATE / BUFFER_SIZE)
+    print(f"{name}, {NUM_CHANNELS} channels x {args.voices} voices, {args.duration:.1f} s, "
+          f"{args.modes or 'voice'} mode, budget {CPU_BUDGET * 100:.0f}%")
+    warm = _engine(render_mode=args.modes or "voice")  # compile kernels, fill caches
+    warm.channels[0].set_patch(DEFAULT_PATCHES[name].copy())
+    warm.channels[0].note_on(60, 100)
+    for _ in range(5):
+        warm._render_next(BUFFER_SIZE)
+    print(f"{'policy':10s} {'load p50':>8s} {'p99':>6s} {'max':>6s} {'misses':>7s} {'culled':>7s} {'voices':>7s}")
+    for policy in CULL_POLICIES:
+        engine = _engine(render_mode=args.modes or "voice", max_voices=args.voices, seed=1, cull_policy=policy)
+        for ch in engine.channels:
+            ch.set_patch(DEFAULT_PATCHES[name].copy())
+        voices = []
+        sounding = 0
+        for b in range(n_blocks):
+            if b % step == 0:
+                note = 36 + (b // step * 7) % 48
+                for ch in engine.channels:
+                    ch.note_on(note, 100)
+                voices.append((b + hold, note))
+            while voices and voices[0][0] <= b:
+                note = voices.pop(0)[1]
+                for ch in engine.channels:
+                    ch.note_off(note)
+            engine._render_next(BUFFER_SIZE)
+            sounding += sum(ch.allocator.active_voice_count() for ch in engine.channels)
+        st = engine.stats()
+        print(f"{policy:10s} {st['load_p50'] * 100:7.0f}% {st['load_p99'] * 100:5.0f}% {st['load_max'] * 100:5.0f}% "
+              f"{st['deadline_misses']:7d} {st['culled_voices']:7d} {sounding / n_blocks:7.1f}")
+
+
+def _triad(k: int) -> tuple[int, int, int]:
+    """k-th chord of bench silence: a major triad, roots a fifth apart within three octaves."""
+    root = 36 + (k * 7) % 36
+    return root, root + 4, root + 7
+
+
+def bench_silence(args):
+    """Active voices with and without early retirement of silent release tails.
+
+    Each preset with an amp release of 0.5 s or more plays short chords (a
+    triad every second, held for half a second, the root moving by fifths
+    over three octaves, so release tails pile up) for --duration seconds,
+    then rings out for 8 s, once with the silence threshold off (-inf dB) and once
+    at SILENCE_DB. Prints the mean number of active voices per block and the
+    realtime factor of both. (The renders are not compared sample by sample:
+    a voice freed early is reused for a later note, which then starts from
+    that voice's filter state instead of another's.)
+    """
+    from ..config import SAMPLE_RATE, SILENCE_DB
+    mode = args.modes or "voice"
+    n_blocks = int((args.duration + 8.0) * SAMPLE_RATE / BUFFER_SIZE)
+    step = int(SAMPLE_RATE / BUFFER_SIZE)
+    hold = step // 2
+    last = int(args.duration * SAMPLE_RATE / BUFFER_SIZE)
+    print(f"short triads, {args.duration:.1f} s + 8 s tail, {args.voices} voices, {mode} mode; "
+          f"threshold {SILENCE_DB:.0f} dB")
+    print(f"{'patch':16s} {'release':>7s} {'voices':>7s} {'early':>7s} {'saved':>6s} {'x rt':>6s} {'early':>6s}")
+    names = [args.patch] if args.patch else [n for n, p in DEFAULT_PATCHES.items() if p.amp_adsr.release >= 0.5]
+    for name in names:
+        runs = []
+        for silence_db in (-np.inf, SILENCE_DB):
+            engine = _engine(render_mode=mode, max_voices=args.voices, seed=1, silence_db=silence_db)
+            ch = engine.channels[0]
+            ch.set_patch(DEFAULT_PATCHES[name].copy())
+            active = 0
+            elapsed = 0.0
+            for b in range(n_blocks):
+                if b < last and b % step == 0:
+                    for note in _triad(b // step):
+                        ch.note_on(note, 100)
+                if b >= hold and b - hold < last and (b - hold) % step == 0:
+                    for note in _triad((b - hold) // step):
+                        ch.note_off(note)
+                t0 = time.perf_counter()
+                engine._render(BUFFER_SIZE)
+                elapsed += time.perf_counter() - t0
+                active += ch.allocator.active_voice_count()
+            runs.append((active / n_blocks, n_blocks * BUFFER_SIZE / SAMPLE_RATE / elapsed))
+        (v_ref, rt_ref), (v_new, rt_new) = runs
+        saved = 100.0 * (1.0 - v_new / v_ref) if v_ref else 0.0
+        print(f"{name:16s} {DEFAULT_PATCHES[name].amp_adsr.release:6.1f}s {v_ref:7.2f} {v_new:7.2f} {saved:5.0f}% "
+              f"{rt_ref:6.1f} {rt_new:6.1f}")
+
+
+def _callback_heap(engine: "AudioEngine", frames: int, runs: int = 20) -> tuple[int, float, float]:
+    """Largest transient heap use (bytes) of one audio callback, via tracemalloc.
+
+    Also returns the bytes and the number of heap blocks kept per callback,
+    the smaller of two windows of 5 * runs callbacks: NumPy fills internal
+    caches now and then, once, while a callback that holds on to memory
+    every block shows up in both.
+    """
+    import tracemalloc
+    outdata = np.zeros((frames, 1), dtype=np.float32)
+    for _ in range(5):  # scratch buffers grow to this block size
+        engine._audio_callback(outdata, frames, None, None)
+    own = [tracemalloc.Filter(False, tracemalloc.__file__)]  # the snapshots themselves
+    tracemalloc.start()
+    worst = 0
+    kept = blocks = float("inf")
+    try:
+        for _ in range(runs):
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            engine._audio_callback(outdata, frames, None, None)
+            worst = max(worst, tracemalloc.get_traced_memory()[1] - base)
+        before = tracemalloc.take_snapshot().filter_traces(own)
+        for _ in range(2):
+            start = tracemalloc.get_traced_memory()[0]
+            for _ in range(5 * runs):
+                engine._audio_callback(outdata, frames, None, None)
+            kept = min(kept, (tracemalloc.get_traced_memory()[0] - start) / (5 * runs))
+            after = tracemalloc.take_snapshot().filter_traces(own)
+            diff = after.compare_to(before, "filename")
+            blocks = min(blocks, sum(stat.count_diff for stat in diff) / (5 * runs))
+            before = after
+    finally:
+        tracemalloc.stop()
+    return worst, kept, blocks
+
+
+def bench_alloc(args):
+    """Heap allocation of a full audio callback in steady state.
+
+    Each preset runs the real callback (held chord, no events) at two block
+    sizes. A stage that allocates sample buffers makes the transient heap
+    grow with the block; without them only a few KB of Python objects
+    (array views, floats, the kernel call's arguments) remain, the same at
+    any block size. Exits with status 1 when a preset allocates 1 B or more
+    per extra sample, more than TRANSIENT_BUDGET bytes in one callback, or
+    keeps 64 B (less than one small array) or one heap block per callback.
+    """
+    mode = args.modes or "voice"
+    small, large = BUFFER_SIZE, 8 * BUFFER_SIZE
+    print(f"{args.voices}-note chord, {mode} mode, {args.precision}; peak transient heap per callback")
+    print(f"{'patch':16s} {small:>8d} {large:>8d}  per extra sample  kept per callback")
+    failed = []
+    for name in _patch_names(args):
+        heap = []
+        kept = blocks = 0.0
+        for frames in (small, large):
+            # Tracing slows the callback past the CPU budget; culling would change the voices
+            engine = _engine(render_mode=mode, max_voices=args.voices, precision=args.precision,
+                             cull_policy="off")
+            engine.channels[0].set_patch(DEFAULT_PATCHES[name].copy())
+            for i in range(args.voices):
+                engine.channels[0].note_on(36 + (i * 5) % 60, 100)
+            peak, k, b = _callback_heap(engine, frames)
+            heap.append(peak)
+            kept = max(kept, k)
+            blocks = max(blocks, b)
+        per_sample = (heap[1] - heap[0]) / (large - small)
+        flag = ""
+        if per_sample >= 1.0:
+            flag = "  allocates sample buffers"
+        elif max(heap) > TRANSIENT_BUDGET:
+            flag = "  over the transient budget"
+        elif kept >= 64.0 or blocks >= 1.0:
+            flag = "  keeps memory every block"
+        if flag:
+            failed.append(name)
+        print(f"{name:16s} {heap[0]:8d} {heap[1]:8d}  {per_sample:14.2f} B  "
+              f"{kept:7.1f} B {blocks:5.2f} blocks{flag}")
+    if failed:
+        raise SystemExit(f"{len(failed)} preset(s) allocate in steady state: {', '.join(failed)}")
+
+
+def _patch_names(args) -> list[str]:
+    if args.patch:
+        if args.patch not in DEFAULT_PATCHES:
+            raise SystemExit(f"Unknown patch: {args.patch}")
+        return [args.patch]
+    return list(DEFAULT_PATCHES)
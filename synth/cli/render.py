@@ -0,0 +1,68 @@
+import time
+from ..config import SAMPLE_RATE, BUFFER_SIZE, MAX_VOICES, RENDER_MODES, RENDER_WORKERS, PRECISIONS, PRECISION
+
+
+def demo_events(duration: float, channel: int = 0) -> list[tuple[float, dict]]:
+    """Arpeggio over the first half of `duration`, then a held four-note chord."""
+    events = []
+    arp = [48, 55, 60, 64, 67, 72, 67, 64]
+    t = 0.0
+    step = 0.25
+    i = 0
+    while t + step <= duration * 0.5:
+        note = arp[i % len(arp)]
+        events.append((t, {"type": "note_on", "channel": channel, "note": note, "velocity": 100}))
+        events.append((t + step * 0.8, {"type": "note_off", "channel": channel, "note": note, "velocity": 0}))
+        t += step
+        i += 1
+    chord_off = duration * 0.8
+    for note in (60, 64, 67, 72):
+        events.append((t, {"type": "note_on", "channel": channel, "note": note, "velocity": 80}))
+        events.append((chord_off, {"type": "note_off", "channel": channel, "note": note, "velocity": 0}))
+    return events
+
+
+def run_render(args) -> float:
+    """Render the demo sequence offline and print the realtime factor. Returns it."""
+    from ..engine.audio_engine import AudioEngine  # deferred: keeps CLI startup light
+    from ..patch.default_patches import DEFAULT_PATCHES
+    engine = AudioEngine(render_mode=args.mode, max_voices=args.voices, render_workers=args.workers,
+                         precision=args.precision, seed=args.seed)
+    events = []
+    for ch_idx in range(args.channels):
+        if args.patch:
+            if args.patch not in DEFAULT_PATCHES:
+                raise SystemExit(f"Unknown patch: {args.patch}")
+            engine.channels[ch_idx].set_patch(DEFAULT_PATCHES[args.patch].copy())
+        events += demo_events(args.duration, ch_idx)
+
+    t0 = time.perf_counter()
+    engine.render_offline(events, args.duration, output=args.output, block_size=args.block_size)
+    elapsed = time.perf_counter() - t0
+
+    factor = args.duration / elapsed if elapsed > 0 else float("inf")
+    print(f"Rendered {args.duration:.2f} s [{engine.channels[0].patch.name}, "
+          f"{args.channels} ch, {args.mode} mode, {args.precision}, {SAMPLE_RATE} Hz, "
+          f"block {args.block_size}] "
+          f"in {elapsed:.3f} s — {factor:.1f}x realtime")
+    if args.output:
+        print(f"Wrote {args.output}")
+    return factor
+
+
+def add_render_parser(subparsers):
+    p = subparsers.add_parser("render", help="Render offline (no audio device) and report speed")
+    p.add_argument("--patch", type=str, default=None, help="Preset to render (default: Init)")
+    p.add_argument("--duration", type=float, default=8.0, help="Length in seconds")
+    p.add_argument("--output", "-o", type=str, default=None, help="Write a 16-bit WAV file")
+    p.add_argument("--channels", type=int, default=1, choices=range(1, 5),
+                   help="Play the sequence on this many channels at once")
+    p.add_argument("--block-size", type=int, default=BUFFER_SIZE, help="Samples per render block")
+    p.add_argument("--mode", choices=RENDER_MODES, default="voice", help="Voice render path")
+    p.add_argument("--voices", type=int, default=MAX_VOICES, help="Polyphony per channel")
+    p.add_argument("--workers", type=int, default=RENDER_WORKERS,
+                   help="Render channels on this many worker threads (0 = serial)")
+    p.add_argument("--precision", choices=PRECISIONS, default=PRECISION, help="Sample format of the voice chain")
+    p.add_argument("--seed", type=int, default=None,
+                   help="Noise seed; renders with the same seed are identical (default: random)")
+    return p
@@ -19,11 +19,16 @@ VOOG commands:
 
   volume <v>              - Set master volume (0-1)
   voices                  - Show active voice count per channel
+  stats [reset]           - Show render load (p50/p99/max) and xruns
+  profile on|off          - Enable/disable per-stage DSP timing
+  profile [show|reset]    - Show/clear per-stage times per channel and patch
+  profile save <file>     - Write the stage profile as JSON
   panic                   - All notes off
 
   midi list               - List MIDI ports
   midi open [port]        - Open a MIDI port
   midi close              - Close MIDI port
+  midi stats              - Show event ring counters (dropped events etc.)
 
   help                    - Show this help
   quit / exit             - Stop VOOG
@@ -57,13 +62,17 @@ def run_repl(engine: AudioEngine, midi_input: MidiInput):
             elif cmd == "help":
                 _print_help()
             elif cmd == "panic":
-                for ch in engine.channels:
-                    ch.all_notes_off()
+                for i in range(len(engine.channels)):
+                    engine.send_cc(i, 123, 0)  # All Notes Off
                 print("All notes off.")
             elif cmd == "voices":
                 for i, ch in enumerate(engine.channels):
                     count = ch.allocator.active_voice_count()
                     print(f"  Channel {i+1}: {count} active voices [{ch.patch.name}]")
+            elif cmd == "stats":
+                _handle_stats(parts[1:], engine)
+            elif cmd == "profile":
+                _handle_profile(parts[1:], engine)
             elif cmd == "volume" and len(parts) >= 2:
                 engine.master_volume = float(parts[1])
                 print(f"Master volume: {engine.master_volume:.2f}")
@@ -72,13 +81,48 @@ def run_repl(engine: AudioEngine, midi_input: MidiInput):
             elif cmd == "ch":
                 _handle_channel(parts[1:], engine, pm)
             elif cmd == "midi":
-                _handle_midi(parts[1:], midi_input)
+                _handle_midi(parts[1:], engine, midi_input)
             else:
                 print(f"Unknown command: {cmd}. Type 'help' for commands.")
         except Exception as e:
             print(f"Error: {e}")
 
 
+def _handle_stats(args: list[str], engine: AudioEngine):
+    if args and args[0].lower() == "reset":
+        engine.reset_stats()
+        print("Stats reset.")
+        return
+    st = engine.stats()
+    print(f"  Blocks rendered: {st['blocks']}  callbacks: {st['callbacks']}")
+    print(f"  CPU load  p50 {st['load_p50'] * 100:5.1f}%  p99 {st['load_p99'] * 100:5.1f}%  "
+          f"max {st['load_max'] * 100:5.1f}%  (of the block budget)")
+    print(f"  Render    p50 {st['render_ms_p50']:.2f} ms  p99 {st['render_ms_p99']:.2f} ms  "
+          f"max {st['render_ms_max']:.2f} ms")
+    print(f"  Deadline misses: {st['deadline_misses']}  xruns: {st['xruns']} "
+          f"(underflow {st['output_underflows']}, overflow {st['output_overflows']})"
+          f"  lookahead underflows: {st['lookahead_underflows']}")
+    print(f"  Voices culled: {st['culled_voices']} in {st['cull_blocks']} blocks "
+          f"(policy {st['cull_policy']}, budget {st['cpu_budget'] * 100:.0f}%)")
+
+
+def _handle_profile(args: list[str], engine: AudioEngine):
+    sub = args[0].lower() if args else "show"
+    if sub in ("on", "off"):
+        engine.set_profiling(sub == "on")
+        print(f"Stage profiling {sub}.")
+    elif sub == "show":
+        print(engine.profiler.table())
+    elif sub == "reset":
+        engine.profiler.reset()
+        print("Profile reset.")
+    elif sub == "save" and len(args) >= 2:
+        engine.profiler.save(args[1])
+        print(f"Profile saved to {args[1]}")
+    else:
+        print("Usage: profile on|off|show|reset|save <file>")
+
+
 def _handle_patch(args: list[str], engine: AudioEngine, pm: PatchManager):
     if not args:
         print("Usage: patch list|load|save|file")
@@ -140,9 +184,9 @@ def _handle_channel(args: list[str], engine: AudioEngine, pm: PatchManager):
         print("Usage: ch <n> patch <name> | set <param> <value> | volume <v>")
 
 
-def _handle_midi(args: list[str], midi_input: MidiInput):
+def _handle_midi(args: list[str], engine: AudioEngine, midi_input: MidiInput):
     if not args:
-        print("Usage: midi list|open|close")
+        print("Usage: midi list|open|close|stats")
         return
     sub = args[0].lower()
 
@@ -163,5 +207,9 @@ def _handle_midi(args: list[str], midi_input: MidiInput):
     elif sub == "close":
         midi_input.close()
         print("MIDI closed.")
+    elif sub == "stats":
+        for name, st in engine.event_stats().items():
+            print(f"  {name:5s} pushed {st['pushed']}  dropped {st['dropped']}  "
+                  f"pending {st['pending']}  high water {st['high_water']}/{st['capacity']}")
     else:
-        print("Usage: midi list|open [port]|close")
+        print("Usage: midi list|open [port]|close|stats")
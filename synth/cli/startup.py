@@ -0,0 +1,78 @@
+import builtins
+import sys
+import time
+
+
+def _group(name: str) -> str:
+    """Report key for a module: its top-level package, or synth.<subpackage>."""
+    parts = name.split(".")
+    if parts[0] == "synth" and len(parts) > 1:
+        return ".".join(parts[:2])
+    return parts[0]
+
+
+class StartupProfile:
+    """Import-time breakdown of CLI startup (--startup-profile).
+
+    While active, every first import through the import statement is timed
+    and its self time (excluding nested first imports) is charged to its
+    top-level package, or to synth.<subpackage> for the synth modules.
+    mark() records named startup phases on the same clock.
+    """
+
+    def __init__(self):
+        self._t0 = time.perf_counter()
+        self._last = self._t0
+        self._import = None
+        self._stack: list[float] = []   # child time accumulated per open import
+        self.imports: dict[str, float] = {}
+        self.phases: list[tuple[str, float]] = []
+
+    def start(self):
+        self._import = builtins.__import__
+        builtins.__import__ = self._timed_import
+
+    def stop(self):
+        if self._import is not None:
+            builtins.__import__ = self._import
+            self._import = None
+
+    def _timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        absolute = name
+        if level > 0 and globals:
+            package = globals.get("__package__") or ""
+            base = package.rsplit(".", level - 1)[0] if level > 1 else package
+            absolute = f"{base}.{name}" if name else base
+        if absolute in sys.modules:
+            return self._import(name, globals, locals, fromlist, level)
+        self._stack.append(0.0)
+        t = time.perf_counter()
+        try:
+            return self._import(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - t
+            children = self._stack.pop()
+            if self._stack:
+                self._stack[-1] += elapsed
+            key = _group(absolute)
+            self.imports[key] = self.imports.get(key, 0.0) + elapsed - children
+
+    def mark(self, phase: str):
+        """End the current startup phase under this name."""
+        now = time.perf_counter()
+        self.phases.append((phase, now - self._last))
+        self._last = now
+
+    def report(self, top: int = 12) -> str:
+        total = self._last - self._t0
+        lines = [f"Startup profile: {total * 1000:.1f} ms after interpreter start-up", "  phases:"]
+        for phase, dt in self.phases:
+            lines.append(f"    {phase:28s} {dt * 1000:8.1f} ms")
+        lines.append("  imports (self time per package):")
+        ranked = sorted(self.imports.items(), key=lambda kv: kv[1], reverse=True)
+        for key, dt in ranked[:top]:
+            lines.append(f"    {key:28s} {dt * 1000:8.1f} ms")
+        rest = sum(dt for _, dt in ranked[top:])
+        if rest > 0:
+            lines.append(f"    {f'({len(ranked) - top} more)':28s} {rest * 1000:8.1f} ms")
+        return "\n".join(lines)
@@ -1,10 +1,35 @@
+import os
+
 SAMPLE_RATE = 44100
 BUFFER_SIZE = 256
 MAX_VOICES = 8
+RENDER_MODES = ("voice", "bank", "fused")  # per-voice objects, VoiceBank, or VoiceBank + numba kernel
+PRECISIONS = ("float64", "float32")  # sample format of voice buffers and mixing
+PRECISION = "float64"
 NUM_CHANNELS = 4
+RENDER_WORKERS = 0  # 0 = render channels serially in the audio callback
+LOOKAHEAD_BLOCKS = 0  # >0 = render this many blocks ahead on a separate thread
+# Live rendering that takes longer than CPU_BUDGET of a block's duration fades
+# voices out, in the order the cull policy picks them
+CULL_POLICIES = ("off", "quietest", "releasing", "inaudible")
+CULL_POLICY = "releasing"
+CPU_BUDGET = 0.8
+CULL_THRESHOLD_DB = -60.0  # "inaudible": only voices quieter than this are culled
+CULL_FADE_MS = 5.0  # fade-out of a culled voice
+CULL_AFTER_BLOCKS = 4  # consecutive blocks over budget before culling starts
+# A releasing voice whose block peak, scaled by the channel and master gain,
+# stays below this is retired early (the RT60 floor: 60 dB under full scale;
+# -inf disables)
+SILENCE_DB = -60.0
 NUM_OSCILLATORS = 3
 WAVETABLE_SIZE = 2048
+WAVETABLE_MIP_BASE = 20.0  # Hz; lowest band-limited wavetable level ends one step above this
+WAVETABLE_MIPS_PER_OCTAVE = 2  # half-octave levels: at most a tritone of missing top octave
+# Precomputed tables are cached here and memory-mapped on later imports ("" disables the cache)
+TABLE_CACHE_DIR = os.environ.get("VOOG_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "voog"))
 CONTROL_RATE_DIVIDER = 16  # Envelope/LFO updated every 16 samples
 CONTROL_RATE = SAMPLE_RATE / CONTROL_RATE_DIVIDER
+FILTER_TABLE_SIZE = 4096  # tan() lookup intervals for the ladder's modulated coefficients
 MIDI_QUEUE_SIZE = 1024
+MAX_EVENT_SPLITS = 8  # Max sub-block renders per callback for sample-accurate notes
 A4_FREQ = 440.0
@@ -0,0 +1,22 @@
+import numpy as np
+from ..config import BUFFER_SIZE
+
+
+class Scratch:
+    """Preallocated work rows reused from block to block.
+
+    Rows start at BUFFER_SIZE samples and are regrown once if a longer block
+    arrives, so rendering in steady state allocates no new sample buffers.
+    Calling the object returns a (rows, n) view; the views are only valid
+    until the next call that grows the buffer.
+    """
+
+    def __init__(self, rows: int, dtype=np.float64, size: int = BUFFER_SIZE):
+        self.rows = rows
+        self.dtype = dtype
+        self._data = np.empty((rows, size), dtype=dtype)
+
+    def __call__(self, n: int) -> np.ndarray:
+        if n > self._data.shape[1]:
+            self._data = np.empty((self.rows, n), dtype=self.dtype)
+        return self._data[:, :n]
@@ -1,94 +1,210 @@
 import numpy as np
-from ..config import SAMPLE_RATE, CONTROL_RATE_DIVIDER
+from ..config import SAMPLE_RATE, CONTROL_RATE_DIVIDER, BUFFER_SIZE
+from ..patch.patch import ADSRParams
+from .buffers import Scratch
+from .params import shared
 
 # Minimum time to avoid division by zero
 _MIN_TIME = 0.001
 
+# Envelope state codes, shared by ADSR and the batched/compiled renderers
+IDLE, ATTACK, DECAY, SUSTAIN, RELEASE = range(5)
+STATE_CODES = {"idle": IDLE, "attack": ATTACK, "decay": DECAY,
+               "sustain": SUSTAIN, "release": RELEASE}
+STATE_NAMES = tuple(STATE_CODES)
+
+# Per dtype: interpolation ramps i/n for every control block length n
+# (1..CONTROL_RATE_DIVIDER), and for full blocks the control block index and
+# ramp position of every sample (grown on demand)
+_RAMPS: dict[np.dtype, list] = {}
+_RAMP_TABLES: dict[np.dtype, tuple[np.ndarray, np.ndarray]] = {}
+
+
+def _ramps(dtype: np.dtype) -> list:
+    ramps = _RAMPS.get(dtype)
+    if ramps is None:
+        ramps = [(np.arange(n, dtype=np.float64) / n).astype(dtype) if n else None
+                 for n in range(CONTROL_RATE_DIVIDER + 1)]
+        _RAMPS[dtype] = ramps
+    return ramps
+
+
+def _ramp_tables(n: int, dtype: np.dtype) -> tuple[np.ndarray, np.ndarray]:
+    tables = _RAMP_TABLES.get(dtype)
+    if tables is None or n > len(tables[0]):
+        size = max(n, BUFFER_SIZE)
+        d = CONTROL_RATE_DIVIDER
+        tables = (np.arange(size, dtype=np.intp) // d,
+                  np.tile(_ramps(dtype)[d], size // d + 1)[:size])
+        _RAMP_TABLES[dtype] = tables
+    block, ramp = tables
+    return block[:n], ramp[:n]
+
+
+def interpolate_control(ctrl: np.ndarray, n_samples: int, out: np.ndarray, work: np.ndarray) -> np.ndarray:
+    """Control-rate values → audio rate, written into `out`.
+
+    The first control block holds its value, every later block ramps
+    linearly from the previous value. `ctrl`, `out` and the (2, >= n_samples)
+    `work` scratch share one dtype; nothing is allocated (broadcasting (blocks, 16) operations would
+    make NumPy allocate iterator buffers, so values are spread with take).
+    """
+    d = CONTROL_RATE_DIVIDER
+    n_blocks = n_samples // d
+    remainder = n_samples % d
+    total = len(ctrl)
+    if total <= 1:
+        out.fill(ctrl[-1])
+        return out
+    out[:d] = ctrl[0]
+    if n_blocks > 1:
+        span = (n_blocks - 1) * d
+        full = out[d:d + span]
+        step, prev = work[0, :n_blocks - 1], work[1, :span]
+        block, ramp = _ramp_tables(span, out.dtype)
+        np.subtract(ctrl[1:n_blocks], ctrl[:n_blocks - 1], out=step)
+        np.take(step, block, out=full, mode="clip")
+        full *= ramp
+        np.take(ctrl, block, out=prev, mode="clip")
+        full += prev
+    if remainder:
+        tail = out[n_blocks * d:]
+        np.multiply(_ramps(out.dtype)[remainder], ctrl[-1] - ctrl[-2], out=tail)
+        tail += ctrl[-2]
+    return out
+
 
 class ADSR:
-    def __init__(self, attack=0.01, decay=0.1, sustain=0.7, release=0.3):
-        self.attack = attack    # seconds
-        self.decay = decay      # seconds
-        self.sustain = sustain   # 0..1
-        self.release = release   # seconds
-        self._state = "idle"     # idle, attack, decay, sustain, release
+    attack = shared("attack")      # seconds
+    decay = shared("decay")        # seconds
+    sustain = shared("sustain")    # 0..1
+    release = shared("release")    # seconds
+
+    def __init__(self, attack=0.01, decay=0.1, sustain=0.7, release=0.3, dtype=np.float64):
+        self.params = ADSRParams(attack, decay, sustain, release)
+        self._state = IDLE       # IDLE, ATTACK, DECAY, SUSTAIN or RELEASE
         self._level = 0.0
         self._samples_in_state = 0
+        self.dtype = np.dtype(dtype)
+        # Control-rate levels are computed in double precision (block sizes,
+        # levels), then handed to the interpolation in the voice's dtype
+        size = BUFFER_SIZE // CONTROL_RATE_DIVIDER + 1
+        self._steps = Scratch(2, size=size)
+        self._mask = Scratch(1, np.bool_, size=size)
+        self._ctrl = Scratch(1, dtype, size=size)
+        self._work = Scratch(2, dtype)
 
     def gate_on(self):
-        self._state = "attack"
+        self._state = ATTACK
         self._samples_in_state = 0
 
     def gate_off(self):
-        if self._state != "idle":
-            self._state = "release"
+        if self._state != IDLE:
+            self._state = RELEASE
             self._samples_in_state = 0
 
+    @property
+    def state_name(self) -> str:
+        return STATE_NAMES[self._state]
+
     def is_active(self) -> bool:
-        return self._state != "idle"
+        return self._state != IDLE
 
-    def render(self, n_samples: int) -> np.ndarray:
-        """Render envelope at control rate, then interpolate to audio rate."""
-        n_blocks = n_samples // CONTROL_RATE_DIVIDER
-        remainder = n_samples % CONTROL_RATE_DIVIDER
-        total_blocks = n_blocks + (1 if remainder else 0)
+    def render(self, n_samples: int, out: np.ndarray | None = None) -> np.ndarray:
+        """Render envelope at control rate, then interpolate to audio rate.
 
-        control_values = np.empty(total_blocks, dtype=np.float64)
-
-        for i in range(total_blocks):
-            block_size = CONTROL_RATE_DIVIDER if i < n_blocks else remainder
-            self._advance(block_size)
-            control_values[i] = self._level
-
-        # Interpolate control values to audio rate
-        if total_blocks <= 1:
-            return np.full(n_samples, self._level, dtype=np.float64)
-
-        # Each control value represents a block of CONTROL_RATE_DIVIDER samples
-        out = np.empty(n_samples, dtype=np.float64)
-        pos = 0
-        for i in range(total_blocks):
-            block_size = CONTROL_RATE_DIVIDER if i < n_blocks else remainder
-            if block_size == 0:
-                continue
-            if i == 0:
-                out[pos:pos + block_size] = control_values[i]
-            else:
-                prev = control_values[i - 1]
-                cur = control_values[i]
-                # Linear ramp without np.linspace overhead
-                t = np.arange(block_size, dtype=np.float64) / block_size
-                out[pos:pos + block_size] = prev + (cur - prev) * t
-            pos += block_size
-        return out
+        A block that starts held (sustain or idle) is a constant and is filled
+        directly; otherwise _segments() solves the control levels in closed form.
+        """
+        d = CONTROL_RATE_DIVIDER
+        n_blocks = n_samples // d
+        remainder = n_samples % d
+        total_blocks = n_blocks + (1 if remainder else 0)
+        if out is None:
+            out = np.empty(n_samples, dtype=self.dtype)
 
-    def _advance(self, n_samples: int):
-        self._samples_in_state += n_samples
-        if self._state == "attack":
-            rate = max(self.attack, _MIN_TIME) * SAMPLE_RATE
-            self._level += n_samples / rate
-            if self._level >= 1.0:
-                self._level = 1.0
-                self._state = "decay"
-                self._samples_in_state = 0
-        elif self._state == "decay":
-            rate = max(self.decay, _MIN_TIME) * SAMPLE_RATE
-            self._level -= (1.0 - self.sustain) * n_samples / rate
-            if self._level <= self.sustain:
+        if self._state == SUSTAIN or self._state == IDLE:
+            # Held level: every control value, and so every sample, is the same
+            if self._state == SUSTAIN:
                 self._level = self.sustain
-                self._state = "sustain"
-                self._samples_in_state = 0
-        elif self._state == "sustain":
-            self._level = self.sustain
-        elif self._state == "release":
-            rate = max(self.release, _MIN_TIME) * SAMPLE_RATE
-            self._level -= self._level * n_samples / rate
-            if self._level < 1e-5:
-                self._level = 0.0
-                self._state = "idle"
+            self._samples_in_state += n_samples
+            out.fill(self._level)
+            return out
+
+        sizes, levels = self._steps(total_blocks)
+        sizes.fill(d)
+        if remainder:
+            sizes[-1] = remainder
+        self._segments(sizes, levels)
+
+        if self.dtype == np.float64:
+            control_values = levels
+        else:
+            control_values = self._ctrl(total_blocks)[0]
+            np.copyto(control_values, levels, casting="same_kind")
+        return interpolate_control(control_values, n_samples, out, self._work(n_samples))
+
+    def _segments(self, sizes: np.ndarray, levels: np.ndarray):
+        """Fill `levels` with the level after each control block of `sizes` samples.
+
+        Each state is solved over all remaining blocks at once: attack and
+        decay are running sums of their per-block steps, release a running
+        product of its per-block decay factors, and the first block that
+        crosses the state's threshold ends the segment (the next state takes
+        over from the block after it). The running sums add in the same order
+        as stepping block by block, so attack and decay are bit-identical to
+        it; decay is summed negated to keep the sequence ascending for
+        searchsorted.
+        """
+        total = len(levels)
+        i = 0
+        while i < total:
+            seg = levels[i:]
+            n = total - i
+            state = self._state
+            if state == ATTACK:
+                np.divide(sizes[i:], max(self.attack, _MIN_TIME) * SAMPLE_RATE, out=seg)
+                seg[0] += self._level
+                np.add.accumulate(seg, out=seg)
+                hit = int(seg.searchsorted(1.0))
+                if hit < n:
+                    seg[hit] = 1.0
+                    self._state = DECAY
+            elif state == DECAY:
+                np.multiply(sizes[i:], 1.0 - self.sustain, out=seg)
+                seg /= max(self.decay, _MIN_TIME) * SAMPLE_RATE
+                seg[0] -= self._level
+                np.add.accumulate(seg, out=seg)  # -level after each block
+                hit = int(seg.searchsorted(-self.sustain))
+                np.negative(seg, out=seg)
+                if hit < n:
+                    seg[hit] = self.sustain
+                    self._state = SUSTAIN
+            elif state == RELEASE:
+                np.divide(sizes[i:], max(self.release, _MIN_TIME) * SAMPLE_RATE, out=seg)
+                np.subtract(1.0, seg, out=seg)
+                seg[0] *= self._level
+                np.multiply.accumulate(seg, out=seg)
+                mask = self._mask(n)[0]
+                hit = np.count_nonzero(np.greater_equal(seg, 1e-5, out=mask))
+                if hit < n:
+                    seg[hit] = 0.0
+                    self._state = IDLE
+            else:
+                if state == SUSTAIN:
+                    self._level = self.sustain
+                seg.fill(self._level)
+                hit = n
+            if hit < n:
+                self._level = float(seg[hit])
                 self._samples_in_state = 0
+                i += hit + 1
+            else:
+                self._level = float(seg[-1])
+                self._samples_in_state += int(sizes[i]) * (n - 1) + int(sizes[-1])
+                i = total
 
     def reset(self):
-        self._state = "idle"
+        self._state = IDLE
         self._level = 0.0
         self._samples_in_state = 0
@@ -1,3 +1,5 @@
+import math
+import time
 import numpy as np
 
 try:
@@ -6,100 +8,427 @@ try:
 except ImportError:
     HAS_NUMBA = False
 
-from ..config import SAMPLE_RATE
+from ..config import SAMPLE_RATE, BUFFER_SIZE, CONTROL_RATE_DIVIDER, FILTER_TABLE_SIZE
+from ..patch.patch import FilterParams
+from .buffers import Scratch
+from .params import shared
 
+# Which implementation runs the ladder: compiled sample loops, or NumPy block algorithms
+BACKEND = "numba" if HAS_NUMBA else "numpy"
 
 if HAS_NUMBA:
-    @numba.jit(nopython=True, cache=True)
-    def _moog_ladder_process(samples, cutoff_buf, resonance, state, sr):
-        """Huovilainen Moog ladder filter – 24dB/oct, sample-by-sample."""
-        n = len(samples)
-        out = np.empty(n, dtype=np.float64)
-        s0, s1, s2, s3 = state[0], state[1], state[2], state[3]
-        for i in range(n):
-            fc = cutoff_buf[i]
-            # Pre-warp
-            f = 2.0 * sr * np.tan(np.pi * fc / sr) if fc < sr * 0.49 else sr * 0.49 * 2.0
-            g = f / (2.0 * sr)
-            G = g / (1.0 + g)
-            # Feedback
-            r = resonance * 4.0  # 0..4 range
-            S = G * G * G * s0 + G * G * s1 + G * s2 + s3
-            u = (samples[i] - r * S) / (1.0 + r * G * G * G * G)
-            # Four cascaded one-pole filters
-            v = (u - s0) * G
-            lp = v + s0
-            s0 = lp + v
-            v = (lp - s1) * G
-            lp = v + s1
-            s1 = lp + v
-            v = (lp - s2) * G
-            lp = v + s2
-            s2 = lp + v
-            v = (lp - s3) * G
-            lp = v + s3
-            s3 = lp + v
-            out[i] = lp
-        state[0], state[1], state[2], state[3] = s0, s1, s2, s3
-        return out
+    _jit = numba.jit(nopython=True, nogil=True, cache=True, fastmath={"contract"})
+    _jit_exact = numba.jit(nopython=True, nogil=True, cache=True)
 else:
-    def _moog_ladder_process(samples, cutoff_buf, resonance, state, sr):
-        """Pure-Python fallback (slower)."""
-        n = len(samples)
-        out = np.empty(n, dtype=np.float64)
-        s0, s1, s2, s3 = state[0], state[1], state[2], state[3]
-        for i in range(n):
-            fc = cutoff_buf[i]
-            fc = min(fc, sr * 0.49)
-            f = 2.0 * sr * np.tan(np.pi * fc / sr)
-            g = f / (2.0 * sr)
-            G = g / (1.0 + g)
-            r = resonance * 4.0
-            S = G * G * G * s0 + G * G * s1 + G * s2 + s3
-            u = (samples[i] - r * S) / (1.0 + r * G * G * G * G)
-            v = (u - s0) * G
-            lp = v + s0
-            s0 = lp + v
-            v = (lp - s1) * G
-            lp = v + s1
-            s1 = lp + v
-            v = (lp - s2) * G
-            lp = v + s2
-            s2 = lp + v
-            v = (lp - s3) * G
-            lp = v + s3
-            s3 = lp + v
-            out[i] = lp
-        state[0], state[1], state[2], state[3] = s0, s1, s2, s3
+    def _jit(fn):
+        """Without numba these are plain Python; the entry points get NumPy block versions below."""
+        return fn
+    _jit_exact = _jit
+
+# Cutoffs are limited to this fraction of the sample rate; the prewarped gain
+# is clamped to g = 0.49 from there on
+_TOP = 0.49
+
+# The ladder is linear in its input and state, so one sample is a 5x5 matrix
+# (row-major) mapping (x, s0, s1, s2, s3) to (y, s0', s1', s2', s3')
+MATRIX_SIZE = 25
+
+
+def _build_gain_table(size: int) -> np.ndarray:
+    """One-pole gain G = g / (1 + g), g = tan(pi fc / sr), at size + 1 even steps of fc / sr in 0..0.49."""
+    g = np.tan(np.pi * np.linspace(0.0, _TOP, size + 1))
+    return g / (1.0 + g)
+
+
+# Read with linear interpolation for modulated cutoffs; the error is below
+# 1e-7 of G for the default 4096 steps
+GAIN_TABLE = _build_gain_table(FILTER_TABLE_SIZE)
+
+
+@_jit
+def ladder_gain(fc, sr):
+    """Exact one-pole gain G for cutoff fc (Hz), as the per-sample kernel computes it."""
+    f = 2.0 * sr * math.tan(math.pi * fc / sr) if fc < sr * _TOP else sr * _TOP * 2.0
+    g = f / (2.0 * sr)
+    return g / (1.0 + g)
+
+
+@_jit
+def table_gain(fc, sr, table):
+    """One-pole gain G for cutoff fc, interpolated from GAIN_TABLE."""
+    if fc >= sr * _TOP:
+        return _TOP / (1.0 + _TOP)
+    pos = fc * ((table.shape[0] - 1) / (sr * _TOP))
+    k = int(pos)
+    return table[k] + (table[k + 1] - table[k]) * (pos - k)
+
+
+@_jit
+def ladder_tick(x, G, r, norm, s0, s1, s2, s3):
+    """One sample through the ladder; norm = 1 / (1 + r G^4). Returns (output, s0, s1, s2, s3)."""
+    # Feedback
+    S = G * G * G * s0 + G * G * s1 + G * s2 + s3
+    u = (x - r * S) * norm
+    # Four cascaded one-pole filters
+    v = (u - s0) * G
+    lp = v + s0
+    s0 = lp + v
+    v = (lp - s1) * G
+    lp = v + s1
+    s1 = lp + v
+    v = (lp - s2) * G
+    lp = v + s2
+    s2 = lp + v
+    v = (lp - s3) * G
+    lp = v + s3
+    s3 = lp + v
+    return lp, s0, s1, s2, s3
+
+
+@_jit
+def ladder_matrix(G, r, m):
+    """Write the ladder's per-sample matrix for gain G and feedback r (0..4) into m.
+
+    Column c is one ladder_tick of the c-th unit vector of (x, s0, s1, s2, s3).
+    """
+    norm = 1.0 / (1.0 + r * G * G * G * G)
+    for c in range(5):
+        y, a0, a1, a2, a3 = ladder_tick(1.0 if c == 0 else 0.0, G, r, norm, 1.0 if c == 1 else 0.0,
+                                        1.0 if c == 2 else 0.0, 1.0 if c == 3 else 0.0,
+                                        1.0 if c == 4 else 0.0)
+        m[c] = y
+        m[5 + c] = a0
+        m[10 + c] = a1
+        m[15 + c] = a2
+        m[20 + c] = a3
+    return m
+
+
+@_jit
+def matrix_tick(x, m, s0, s1, s2, s3):
+    """One sample with the ladder matrix m; returns (output, s0, s1, s2, s3).
+
+    The five rows are independent, so the state's dependency chain is one
+    row deep instead of running through all four stages and the feedback.
+    """
+    y = m[0] * x + m[1] * s0 + m[2] * s1 + m[3] * s2 + m[4] * s3
+    t0 = m[5] * x + m[6] * s0 + m[7] * s1 + m[8] * s2 + m[9] * s3
+    t1 = m[10] * x + m[11] * s0 + m[12] * s1 + m[13] * s2 + m[14] * s3
+    t2 = m[15] * x + m[16] * s0 + m[17] * s1 + m[18] * s2 + m[19] * s3
+    t3 = m[20] * x + m[21] * s0 + m[22] * s1 + m[23] * s2 + m[24] * s3
+    return y, t0, t1, t2, t3
+
+
+@_jit
+def _moog_ladder_const(samples, m, state, out):
+    """Ladder with a fixed matrix: no coefficient work per sample."""
+    s0, s1, s2, s3 = state[0], state[1], state[2], state[3]
+    for i in range(len(samples)):
+        out[i], s0, s1, s2, s3 = matrix_tick(samples[i], m, s0, s1, s2, s3)
+    state[0], state[1], state[2], state[3] = s0, s1, s2, s3
+    return out
+
+
+@_jit
+def _moog_ladder_mod(samples, cutoff_buf, r, state, sr, table, out):
+    """Ladder with a modulated cutoff: G from the tan table at control rate.
+
+    G is looked up at the start, middle and end of every CONTROL_RATE_DIVIDER
+    samples and follows the parabola through those three points, so the per-sample work is
+    a polynomial step and one division instead of tan() and three.
+    """
+    n = len(samples)
+    div = CONTROL_RATE_DIVIDER
+    s0, s1, s2, s3 = state[0], state[1], state[2], state[3]
+    g0 = table_gain(cutoff_buf[0], sr, table)
+    i = 0
+    while i < n:
+        end = min(i + div, n)
+        nxt = min(i + div, n - 1)
+        span = max(nxt - i, 1)
+        g1 = table_gain(cutoff_buf[nxt], sr, table)
+        # G(k) = g0 + k (a + k b) through (0, g0), (h, G at i + h), (span, g1)
+        h = span // 2
+        if h > 0:
+            a = (table_gain(cutoff_buf[i + h], sr, table) - g0) / h
+            b = ((g1 - g0) / span - a) / (span - h)
+            a -= b * h
+        else:
+            a = g1 - g0
+            b = 0.0
+        for k in range(end - i):
+            G = g0 + k * (a + k * b)
+            G2 = G * G
+            out[i + k], s0, s1, s2, s3 = ladder_tick(samples[i + k], G, r, 1.0 / (1.0 + r * G2 * G2),
+                                                      s0, s1, s2, s3)
+        g0 = g1
+        i = end
+    state[0], state[1], state[2], state[3] = s0, s1, s2, s3
+    return out
+
+
+@_jit
+def _moog_ladder(samples, cutoff_buf, resonance, state, sr, table, matrix, out):
+    """Huovilainen Moog ladder filter – 24dB/oct, into `out`.
+
+    A block-constant cutoff runs with the exact matrix, computed once into
+    the (MATRIX_SIZE,) scratch `matrix`; a modulated one with G interpolated
+    from `table` at control rate.
+    """
+    r = resonance * 4.0  # 0..4 range
+    c0 = cutoff_buf[0]
+    for i in range(1, len(samples)):
+        if cutoff_buf[i] != c0:
+            return _moog_ladder_mod(samples, cutoff_buf, r, state, sr, table, out)
+    return _moog_ladder_const(samples, ladder_matrix(ladder_gain(c0, sr), r, matrix), state, out)
+
+
+@_jit
+def _moog_ladder_process_bank(samples, cutoff_buf, resonance, states, sr, table):
+    """Run the ladder over a (voices, samples) block; states is (voices, 4)."""
+    out = np.empty_like(samples)
+    matrix = np.empty(MATRIX_SIZE)
+    for v in range(samples.shape[0]):
+        _moog_ladder(samples[v], cutoff_buf[v], resonance, states[v], sr, table, matrix, out[v])
+    return out
+
+
+@_jit_exact
+def _moog_ladder_process(samples, cutoff_buf, resonance, state, sr, out):
+    """Reference ladder: exact coefficients (tan and division) at every sample.
+
+    The renderers use _moog_ladder; this is what its accuracy is measured
+    against (`python -m synth bench filter`).
+    """
+    n = len(samples)
+    s0, s1, s2, s3 = state[0], state[1], state[2], state[3]
+    for i in range(n):
+        fc = cutoff_buf[i]
+        # Pre-warp
+        f = 2.0 * sr * np.tan(np.pi * fc / sr) if fc < sr * 0.49 else sr * 0.49 * 2.0
+        g = f / (2.0 * sr)
+        G = g / (1.0 + g)
+        # Feedback
+        r = resonance * 4.0  # 0..4 range
+        S = G * G * G * s0 + G * G * s1 + G * s2 + s3
+        u = (samples[i] - r * S) / (1.0 + r * G * G * G * G)
+        # Four cascaded one-pole filters
+        v = (u - s0) * G
+        lp = v + s0
+        s0 = lp + v
+        v = (lp - s1) * G
+        lp = v + s1
+        s1 = lp + v
+        v = (lp - s2) * G
+        lp = v + s2
+        s2 = lp + v
+        v = (lp - s3) * G
+        lp = v + s3
+        s3 = lp + v
+        out[i] = lp
+    state[0], state[1], state[2], state[3] = s0, s1, s2, s3
+    return out
+
+
+if not HAS_NUMBA:
+    # Without a JIT a per-sample loop costs about 1 ms per 256-sample block.
+    # These replacements do the same arithmetic in a few dozen NumPy calls per
+    # block: the ladder is linear, so its samples can be chained as matrices.
+
+    _EYE5 = np.eye(5)
+    _RESPONSES: dict[tuple[bytes, int], tuple] = {}
+
+    def _ladder_matrices(G, r):
+        """ladder_matrix for an array of gains: (..., 5, 5), same layout (as a view)."""
+        G = np.asarray(G, dtype=np.float64)
+        g = G[..., None]
+        rows = np.empty((5,) + G.shape + (5,))
+        # Stage k's lowpass output lp = G * (its input) + (1 - G) * s_k, and s_k' = 2 lp - s_k,
+        # starting from the feedback-solved input u
+        G2 = G * G
+        lp = np.empty(G.shape + (5,))
+        lp[..., 0] = 1.0 / (1.0 + r * G2 * G2)
+        lp[..., 4] = -r * lp[..., 0]
+        lp[..., 3] = lp[..., 4] * G
+        lp[..., 2] = lp[..., 4] * G2
+        lp[..., 1] = lp[..., 3] * G2
+        for k in range(1, 5):
+            lp *= g
+            lp[..., k] += 1.0 - G
+            np.multiply(lp, 2.0, out=rows[k])
+            rows[k, ..., k] -= 1.0
+        rows[0] = lp
+        return np.moveaxis(rows, 0, -2)
+
+    def _ladder_gains(cutoff_buf, sr):
+        """Exact G for every cutoff, as ladder_gain computes it."""
+        g = np.tan(np.pi / sr * np.minimum(cutoff_buf, sr * _TOP))
+        return g / (1.0 + g)
+
+    def _block_response(m, n):
+        """Impulse response h, zero-input response O (n, 4), input-to-state R (4, n) and A^n for matrix m."""
+        key = (m.tobytes(), n)
+        resp = _RESPONSES.get(key)
+        if resp is None:
+            if len(_RESPONSES) >= 64:
+                _RESPONSES.clear()
+            mm = m.reshape(5, 5)
+            a, b, c = mm[1:, 1:], mm[1:, 0], mm[0, 1:]
+            power = np.empty((n + 1, 4, 4))
+            power[0] = np.eye(4)
+            power[1] = a
+            k = 1
+            while k < n:  # A^(k + i) = A^i A^k
+                step = min(k, n - k)
+                power[k + 1:k + 1 + step] = power[1:1 + step] @ power[k]
+                k += step
+            zero_input = c @ power[:n]
+            h = np.empty(n)
+            h[0] = mm[0, 0]
+            h[1:] = zero_input[:-1] @ b
+            resp = (h, zero_input, (power[n - 1::-1] @ b).T, power[n])
+            _RESPONSES[key] = resp
+        return resp
+
+    def _ladder_blocks(samples, mats, states, out):
+        """Ladder over (voices, n) samples with per-sample matrices (voices, n, 5, 5).
+
+        Each sample is an affine map of (1, s0, s1, s2, s3), its input folded
+        into the first column. The maps within every CONTROL_RATE_DIVIDER-sample
+        run are multiplied up for all runs and voices at once, then the runs'
+        products are chained together.
+        """
+        v, n = samples.shape
+        div = CONTROL_RATE_DIVIDER
+        runs = -(-n // div)
+        h = np.empty((v, runs * div, 5, 5))
+        h[:, :n] = mats
+        h[:, n:] = _EYE5  # padding leaves the state alone
+        y_row = h[:, :, 0].copy()
+        y_row[:, :n, 0] *= samples
+        h[:, :n, 1:, 0] *= samples[..., None]
+        h[:, :, 0] = _EYE5[0]
+        h = h.reshape(v, runs, div, 5, 5)
+        chain = np.empty_like(h)
+        p = np.broadcast_to(_EYE5, (v, runs, 5, 5))
+        for k in range(div):
+            chain[:, :, k] = p
+            p = h[:, :, k] @ p
+        # Running products over the runs (log2(runs) steps): map from the block start to each run's end
+        d = 1
+        while d < runs:
+            p[:, d:] = p[:, d:] @ p[:, :-d]
+            d *= 2
+        z = np.empty((v, 5))
+        z[:, 0] = 1.0
+        z[:, 1:] = states
+        starts = np.empty((v, runs, 5))
+        starts[:, 0] = z
+        starts[:, 1:] = np.einsum("vjcd,vd->vjc", p[:, :-1], z)
+        states[...] = np.einsum("vcd,vd->vc", p[:, -1], z)[:, 1:]
+        zk = np.einsum("vjkcd,vjd->vjkc", chain, starts)
+        y = np.einsum("vjkc,vjkc->vjk", y_row.reshape(v, runs, div, 5), zk)
+        out[...] = y.reshape(v, runs * div)[:, :n]
+        return out
+
+    def _moog_ladder_const(samples, m, state, out):
+        """Fixed matrix: each BUFFER_SIZE chunk is a convolution plus the state's decay, from a cached response."""
+        for i in range(0, len(samples), BUFFER_SIZE):
+            x = samples[i:i + BUFFER_SIZE]
+            h, zero_input, to_state, a_n = _block_response(m, len(x))
+            y = np.convolve(x, h)[:len(x)] + zero_input @ state
+            state[:] = a_n @ state + to_state @ x
+            out[i:i + len(x)] = y  # (out may be samples itself)
         return out
 
+    def _moog_ladder(samples, cutoff_buf, resonance, state, sr, table, matrix, out):
+        """Block version of the compiled _moog_ladder; exact per-sample G (`table` is unused)."""
+        c0 = cutoff_buf[0]
+        if np.all(cutoff_buf == c0):
+            return _moog_ladder_const(samples, ladder_matrix(ladder_gain(c0, sr), resonance * 4.0, matrix),
+                                      state, out)
+        if len(samples) < 2 * CONTROL_RATE_DIVIDER:
+            # (short event-split blocks: the per-sample loop is cheaper than the block setup)
+            return _moog_ladder_mod(samples, cutoff_buf, resonance * 4.0, state, sr, table, out)
+        mats = _ladder_matrices(_ladder_gains(cutoff_buf, sr), resonance * 4.0)
+        _ladder_blocks(samples[None], mats[None], state[None], out[None])
+        return out
+
+    def _moog_ladder_process_bank(samples, cutoff_buf, resonance, states, sr, table):
+        """Run the ladder over a (voices, samples) block; states is (voices, 4)."""
+        mats = _ladder_matrices(_ladder_gains(cutoff_buf, sr), resonance * 4.0)
+        return _ladder_blocks(samples, mats, states, np.empty_like(samples))
+
+
+def realtime_factor(seconds: float = 0.25) -> float:
+    """How many times faster than realtime one voice's ladder runs here.
+
+    A saw with a swept cutoff goes through a MoogFilter in BUFFER_SIZE blocks
+    (after one untimed block to load or compile the kernels).
+    """
+    n_blocks = max(1, int(seconds * SAMPLE_RATE / BUFFER_SIZE))
+    t = np.arange((n_blocks + 1) * BUFFER_SIZE)
+    saw = 2.0 * ((t * 110.0 / SAMPLE_RATE) % 1.0) - 1.0
+    sweep = 2000.0 * (0.5 - 0.5 * np.cos(2.0 * np.pi * 4.0 * t / SAMPLE_RATE))
+    filt = MoogFilter()
+    filt.cutoff = 500.0
+    filt.resonance = 0.5
+    out = np.empty(BUFFER_SIZE)
+    elapsed = 0.0
+    for i in range(n_blocks + 1):
+        block = slice(i * BUFFER_SIZE, (i + 1) * BUFFER_SIZE)
+        t0 = time.perf_counter()
+        filt.render(saw[block], sweep[block], out)
+        if i:
+            elapsed += time.perf_counter() - t0
+    return n_blocks * BUFFER_SIZE / SAMPLE_RATE / elapsed
+
 
 class MoogFilter:
-    def __init__(self):
-        self.cutoff = 8000.0      # Hz
-        self.resonance = 0.0      # 0..1
-        self.env_amount = 0.0     # semitones of cutoff modulation
-        self.key_tracking = 0.0   # 0..1, 1 = full tracking
+    cutoff = shared("cutoff")              # Hz
+    resonance = shared("resonance")        # 0..1
+    env_amount = shared("env_amount")      # semitones of cutoff modulation
+    key_tracking = shared("key_tracking")  # 0..1, 1 = full tracking
+
+    def __init__(self, dtype=np.float64):
+        self.params = FilterParams()
+        # Samples may be float32; ladder state and cutoff stay float64 for stability
+        self.dtype = np.dtype(dtype)
         self._state = np.zeros(4, dtype=np.float64)
+        self._cutoff = Scratch(1)
+        # Matrix of the last unmodulated cutoff and resonance, reused while they stay put
+        self._matrix_cutoff = -1.0
+        self._matrix_resonance = -1.0
+        self._matrix = np.zeros(MATRIX_SIZE, dtype=np.float64)
 
-    def render(self, samples: np.ndarray, cutoff_mod: np.ndarray | None = None) -> np.ndarray:
+    def render(self, samples: np.ndarray, cutoff_mod: np.ndarray | None = None,
+               out: np.ndarray | None = None) -> np.ndarray:
         """Process audio through the Moog ladder filter.
 
         cutoff_mod: optional per-sample modulation in Hz added to base cutoff.
+        out: buffer for the result; may be `samples` itself (processed in place).
         """
         n = len(samples)
-        if cutoff_mod is not None:
-            cutoff_buf = np.clip(self.cutoff + cutoff_mod, 20.0, SAMPLE_RATE * 0.49)
-        else:
-            cutoff_buf = np.full(n, min(self.cutoff, SAMPLE_RATE * 0.49), dtype=np.float64)
-
-        return _moog_ladder_process(
-            samples.astype(np.float64),
-            cutoff_buf.astype(np.float64),
-            self.resonance,
-            self._state,
-            float(SAMPLE_RATE),
-        )
+        if out is None:
+            out = np.empty(n, dtype=self.dtype)
+        if cutoff_mod is None:
+            fc = min(self.cutoff, SAMPLE_RATE * 0.49)
+            if fc != self._matrix_cutoff or self.resonance != self._matrix_resonance:
+                ladder_matrix(ladder_gain(fc, float(SAMPLE_RATE)), self.resonance * 4.0, self._matrix)
+                self._matrix_cutoff = fc
+                self._matrix_resonance = self.resonance
+            _moog_ladder_const(samples, self._matrix, self._state, out)
+            return out
+
+        cutoff_buf = self._cutoff(n)[0]
+        np.copyto(cutoff_buf, cutoff_mod)  # (widens float32 modulation without a temporary)
+        cutoff_buf += self.cutoff
+        np.clip(cutoff_buf, 20.0, SAMPLE_RATE * 0.49, out=cutoff_buf)
+        # (a flat cutoff_mod still takes the exact path; the matrix is rebuilt then)
+        self._matrix_cutoff = -1.0
+        _moog_ladder(samples, cutoff_buf, self.resonance, self._state, float(SAMPLE_RATE), GAIN_TABLE,
+                     self._matrix, out)
+        return out
 
     def reset(self):
         self._state[:] = 0.0
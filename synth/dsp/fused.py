@@ -0,0 +1,335 @@
+import math
+import numpy as np
+
+try:
+    import numba
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+from ..config import CONTROL_RATE_DIVIDER
+from .envelope import _MIN_TIME, IDLE, ATTACK, DECAY, SUSTAIN, RELEASE
+from .oscillator import WAVEFORMS, osc_ratio
+from .filter import _moog_ladder
+
+WAVEFORM_INDEX = {w: i for i, w in enumerate(WAVEFORMS)}
+
+LFO_WAVEFORMS = {"sine": 0, "triangle": 1, "saw": 2, "square": 3}
+LFO_DESTINATIONS = {"filter": 0, "pitch": 1, "amp": 2}
+
+# Layout of the scalar parameter vector passed to the kernel
+(P_AMP_A, P_AMP_D, P_AMP_S, P_AMP_R,
+ P_FLT_A, P_FLT_D, P_FLT_S, P_FLT_R,
+ P_LFO_WAVE, P_LFO_RATE, P_LFO_DEPTH, P_LFO_DEST,
+ P_GLIDE_TIME,
+ P_NOISE_PINK, P_NOISE_LEVEL, P_NOISE_SHARED,
+ P_CUTOFF, P_RESONANCE, P_ENV_AMOUNT, P_KEY_TRACKING,
+ N_PARAMS) = range(21)
+
+
+def pack_params(patch, out: np.ndarray | None = None) -> np.ndarray:
+    """Flatten the scalar patch parameters into the kernel's parameter vector."""
+    p = np.empty(N_PARAMS, dtype=np.float64) if out is None else out
+    amp, flt = patch.amp_adsr, patch.filter_adsr
+    p[P_AMP_A] = amp.attack
+    p[P_AMP_D] = amp.decay
+    p[P_AMP_S] = amp.sustain
+    p[P_AMP_R] = amp.release
+    p[P_FLT_A] = flt.attack
+    p[P_FLT_D] = flt.decay
+    p[P_FLT_S] = flt.sustain
+    p[P_FLT_R] = flt.release
+    p[P_LFO_WAVE] = LFO_WAVEFORMS.get(patch.lfo.waveform, -1)
+    p[P_LFO_RATE] = patch.lfo.rate
+    p[P_LFO_DEPTH] = patch.lfo.depth
+    p[P_LFO_DEST] = LFO_DESTINATIONS.get(patch.lfo.destination, -1)
+    p[P_GLIDE_TIME] = patch.glide.time
+    p[P_NOISE_PINK] = 1.0 if patch.noise.noise_type == "pink" else 0.0
+    p[P_NOISE_LEVEL] = patch.noise.level
+    p[P_NOISE_SHARED] = 1.0 if patch.noise.shared else 0.0
+    p[P_CUTOFF] = patch.filter.cutoff
+    p[P_RESONANCE] = patch.filter.resonance
+    p[P_ENV_AMOUNT] = patch.filter.env_amount
+    p[P_KEY_TRACKING] = patch.filter.key_tracking
+    return p
+
+
+def pack_oscillators(patch, n_osc: int,
+                     out: tuple[np.ndarray, np.ndarray, np.ndarray] | None = None
+                     ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(table index, frequency ratio, level) per oscillator slot."""
+    if out is None:
+        out = (np.empty(n_osc, dtype=np.int64), np.empty(n_osc, dtype=np.float64),
+               np.empty(n_osc, dtype=np.float64))
+    wave, ratio, level = out
+    wave.fill(0)
+    ratio.fill(1.0)
+    level.fill(0.0)
+    for j, op in enumerate(patch.oscillators[:n_osc]):
+        wave[j] = WAVEFORM_INDEX.get(op.waveform, WAVEFORM_INDEX["saw"])
+        ratio[j] = osc_ratio(op.octave, op.semitone, op.detune)
+        level[j] = op.level
+    return out
+
+
+if HAS_NUMBA:
+    @numba.jit(nopython=True, nogil=True, cache=True)
+    def _adsr_step(state, level, n, attack, decay, sustain, release, sr):
+        """One control-rate step of ADSR._advance on integer states."""
+        if state == ATTACK:
+            level += n / (max(attack, _MIN_TIME) * sr)
+            if level >= 1.0:
+                level = 1.0
+                state = DECAY
+        elif state == DECAY:
+            level -= (1.0 - sustain) * n / (max(decay, _MIN_TIME) * sr)
+            if level <= sustain:
+                level = sustain
+                state = SUSTAIN
+        elif state == SUSTAIN:
+            level = sustain
+        elif state == RELEASE:
+            level *= 1.0 - n / (max(release, _MIN_TIME) * sr)
+            if level < 1e-5:
+                level = 0.0
+                state = IDLE
+        return state, level
+
+    @numba.jit(nopython=True, nogil=True, cache=True)
+    def _lfo_shape(waveform, phase):
+        if waveform == 0:
+            return math.sin(2.0 * math.pi * phase)
+        elif waveform == 1:
+            return 4.0 * abs(phase - 0.5) - 1.0
+        elif waveform == 2:
+            return 2.0 * phase - 1.0
+        elif waveform == 3:
+            return 1.0 if phase < 0.5 else -1.0
+        return 0.0
+
+    @numba.jit(nopython=True, nogil=True, cache=True)
+    def _ctrl_value(ctrl, s, n_blocks, remainder, div):
+        """Audio-rate value at sample s, interpolated like ADSR/LFO.render."""
+        i = s // div
+        if i == 0:
+            return ctrl[0]
+        bs = div if i < n_blocks else remainder
+        prev = ctrl[i - 1]
+        return prev + (ctrl[i] - prev) * ((s - i * div) / bs)
+
+    @numba.jit(nopython=True, nogil=True, cache=True)
+    def render_voices_fused(out, n_voices, params, tables, mip_edges, osc_wave, osc_ratio, osc_level,
+                            amp_state, amp_level, filt_state, filt_level, lfo_phase,
+                            glide_cur, glide_tgt, osc_phase, pink, ladder, white,
+                            velocity, fade, fade_len, base_freq, live, voice_peak, work, gain_table, matrix, sr,
+                            a4_freq):
+        """Render voices 0..n_voices-1 in one compiled sample loop per voice.
+
+        The per-voice state arrays may be longer than n_voices, so a caller
+        can keep them preallocated for all of a channel's voices. Envelopes, LFO, glide, oscillators, noise, ladder filter and VCA run
+        without intermediate arrays; all per-voice state arrays are updated in
+        place. `out` is overwritten with the sum of the voices; `live[v]` is
+        cleared for voices whose amp envelope has finished and `voice_peak[v]` set
+        to the largest absolute sample each voice added. A voice with
+        fade[v] > 0 samples left of a cull fade plays sample s at gain
+        (fade[v] - 1 - s) / fade_len (see engine.culling). `tables` is
+        (waveform, mip level, sample); each oscillator reads the level that
+        mip_level() picks for its peak frequency in the block. `white` holds
+        each voice's white noise, or with shared noise a single row of the
+        channel's finished noise signal. `work` is
+        scratch of shape (8, >= max(samples, oscillators)) and `matrix` the
+        ladder's (MATRIX_SIZE,) scratch, so the kernel itself allocates
+        nothing.
+        """
+        n = out.shape[0]
+        div = CONTROL_RATE_DIVIDER
+        n_blocks = n // div
+        remainder = n % div
+        total = n_blocks + (1 if remainder else 0)
+        ts = tables.shape[2]
+        n_edges = mip_edges.shape[0]
+        n_osc = osc_wave.shape[0]
+
+        amp_ctrl = work[0]
+        filt_ctrl = work[1]
+        lfo_ctrl = work[2]
+        osc_f = work[3]
+        osc_acc = work[4]
+        osc_mip = work[5]
+        sig = work[6]
+        cut = work[7]
+
+        lfo_depth = params[P_LFO_DEPTH]
+        lfo_dest = int(params[P_LFO_DEST])
+        lfo_wave = int(params[P_LFO_WAVE])
+        lfo_inc = params[P_LFO_RATE] * div / sr
+        pitch_lfo = lfo_dest == 1 and lfo_depth > 0.0
+        filter_lfo = lfo_dest == 0 and lfo_depth > 0.0
+        amp_lfo = lfo_dest == 2 and lfo_depth > 0.0
+        glide_time = params[P_GLIDE_TIME]
+        noise_level = params[P_NOISE_LEVEL]
+        pink_noise = params[P_NOISE_PINK] > 0.0
+        shared_noise = params[P_NOISE_SHARED] > 0.0
+        cutoff = params[P_CUTOFF]
+        env_amount = params[P_ENV_AMOUNT]
+        key_tracking = params[P_KEY_TRACKING]
+        resonance = params[P_RESONANCE]
+        fc_max = sr * 0.49
+        modulated = env_amount != 0.0 or filter_lfo
+
+        out[:] = 0.0
+        for v in range(n_voices):
+            # ── Envelopes and LFO at control rate ──
+            st = amp_state[v]
+            lvl = amp_level[v]
+            for i in range(total):
+                bs = div if i < n_blocks else remainder
+                st, lvl = _adsr_step(st, lvl, bs, params[P_AMP_A], params[P_AMP_D],
+                                     params[P_AMP_S], params[P_AMP_R], sr)
+                amp_ctrl[i] = lvl
+            amp_state[v] = st
+            amp_level[v] = lvl
+            if st == IDLE:
+                env_peak = 0.0
+                for s in range(n):
+                    env_peak = max(env_peak, _ctrl_value(amp_ctrl, s, n_blocks, remainder, div))
+                if env_peak < 1e-5:
+                    live[v] = False
+                    continue
+            live[v] = True
+            pk = 0.0
+
+            st = filt_state[v]
+            lvl = filt_level[v]
+            for i in range(total):
+                bs = div if i < n_blocks else remainder
+                st, lvl = _adsr_step(st, lvl, bs, params[P_FLT_A], params[P_FLT_D],
+                                     params[P_FLT_S], params[P_FLT_R], sr)
+                filt_ctrl[i] = lvl
+            filt_state[v] = st
+            filt_level[v] = lvl
+
+            if lfo_depth > 0.0:
+                ph = lfo_phase[v]
+                for i in range(total):  # same phases as lfo.lfo_phases
+                    lfo_ctrl[i] = _lfo_shape(lfo_wave, (ph + i * lfo_inc) % 1.0)
+                lfo_phase[v] = (ph + total * lfo_inc) % 1.0
+
+            # ── Glide: f = tgt + (cur - tgt) * decay ** (s + 1), per sample ──
+            cur = glide_cur[v]
+            tgt = glide_tgt[v]
+            gliding = glide_time > 0.0 and cur != tgt
+            glide_from = cur - tgt
+            decay = 1.0
+            glide_peak = tgt
+            if gliding:
+                coeff = 1.0 - math.exp(-1.0 / (glide_time * sr))
+                decay = 1.0 - coeff
+                cur = tgt + glide_from * decay ** n
+                glide_peak = max(tgt + glide_from * decay, cur)  # the glide is monotonic
+                if abs(cur - tgt) < 0.01:
+                    cur = tgt
+            else:
+                cur = tgt
+            glide_cur[v] = cur
+
+            # Highest frequency of the block (glide and pitch LFO), for the mip level
+            peak_freq = glide_peak
+            if pitch_lfo:
+                peak_freq = 0.0
+                for s in range(n):
+                    f = tgt + glide_from * decay ** (s + 1) if gliding else tgt
+                    lfo = _ctrl_value(lfo_ctrl, s, n_blocks, remainder, div) * lfo_depth
+                    peak_freq = max(peak_freq, 2.0 ** lfo * f)
+
+            for j in range(n_osc):
+                osc_f[j] = tgt * osc_ratio[j]
+                osc_acc[j] = 0.0
+                peak = peak_freq * osc_ratio[j]
+                level = 0
+                while level < n_edges and peak >= mip_edges[level]:
+                    level += 1
+                osc_mip[j] = level
+
+            base_cutoff = cutoff
+            if key_tracking > 0:
+                base_cutoff += (base_freq[v] - a4_freq) * key_tracking
+
+            b0, b1, b2, b3, b4, b5, b6 = (pink[v, 0], pink[v, 1], pink[v, 2], pink[v, 3],
+                                          pink[v, 4], pink[v, 5], pink[v, 6])
+            vel = velocity[v]
+            fl = fade[v]
+
+            # ── Audio-rate loop ──
+            for s in range(n):
+                lfo = 0.0
+                if lfo_depth > 0.0:
+                    lfo = _ctrl_value(lfo_ctrl, s, n_blocks, remainder, div) * lfo_depth
+                pitch_ratio = 1.0
+                if pitch_lfo:
+                    pitch_ratio = 2.0 ** lfo  # 12 semitones per unit, as in the voice path
+                if gliding:
+                    freq = tgt + glide_from * decay ** (s + 1)
+
+                x = 0.0
+                for j in range(n_osc):
+                    if osc_level[j] > 0.0:
+                        if gliding:
+                            inc = freq * osc_ratio[j] * pitch_ratio / sr
+                        else:
+                            inc = osc_f[j] * pitch_ratio / sr
+                        ph = (osc_phase[v, j] + osc_acc[j]) % 1.0
+                        osc_acc[j] += inc
+                        idx_f = ph * ts
+                        k = int(idx_f)
+                        frac = idx_f - k
+                        table = tables[osc_wave[j], int(osc_mip[j])]
+                        x += (table[k % ts] * (1.0 - frac) + table[(k + 1) % ts] * frac) * osc_level[j]
+
+                if noise_level > 0.0 and shared_noise:
+                    x += white[0, s]
+                elif noise_level > 0.0:
+                    w = white[v, s]
+                    if pink_noise:
+                        b0 = 0.99886 * b0 + w * 0.0555179
+                        b1 = 0.99332 * b1 + w * 0.0750759
+                        b2 = 0.96900 * b2 + w * 0.1538520
+                        b3 = 0.86650 * b3 + w * 0.3104856
+                        b4 = 0.55000 * b4 + w * 0.5329522
+                        b5 = -0.7616 * b5 - w * 0.0168980
+                        x += (b0 + b1 + b2 + b3 + b4 + b5 + b6 + w * 0.5362) * 0.11 * noise_level
+                        b6 = w * 0.115926
+                    else:
+                        x += w * noise_level
+
+                # Cutoff modulation
+                if modulated:
+                    mod = 0.0
+                    if env_amount != 0.0:
+                        fenv = _ctrl_value(filt_ctrl, s, n_blocks, remainder, div)
+                        mod += base_cutoff * (2.0 ** (fenv * env_amount / 12.0) - 1.0)
+                    if filter_lfo:
+                        mod += base_cutoff * (2.0 ** (lfo * 2.0 / 12.0) - 1.0)
+                    cut[s] = min(max(cutoff + mod, 20.0), fc_max)
+                else:
+                    cut[s] = min(cutoff, fc_max)
+                sig[s] = x
+
+            # ── Ladder (shared with MoogFilter), in place, then VCA ──
+            _moog_ladder(sig[:n], cut[:n], resonance, ladder[v], sr, gain_table, matrix, sig[:n])
+            for s in range(n):
+                y = sig[s]
+                if amp_lfo:
+                    y *= 1.0 + _ctrl_value(lfo_ctrl, s, n_blocks, remainder, div) * lfo_depth * 0.5
+                y = y * _ctrl_value(amp_ctrl, s, n_blocks, remainder, div) * vel
+                if fl > 0:
+                    y *= max(fl - 1 - s, 0) / fade_len
+                out[s] += y
+                pk = max(pk, abs(y))
+            voice_peak[v] = pk
+
+            for j in range(n_osc):
+                if osc_level[j] > 0.0:
+                    osc_phase[v, j] = (osc_phase[v, j] + osc_acc[j]) % 1.0
+            pink[v, 0], pink[v, 1], pink[v, 2], pink[v, 3] = b0, b1, b2, b3
+            pink[v, 4], pink[v, 5], pink[v, 6] = b4, b5, b6
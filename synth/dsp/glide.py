@@ -1,11 +1,26 @@
 import numpy as np
-from ..config import SAMPLE_RATE
+from ..config import SAMPLE_RATE, BUFFER_SIZE
+from ..patch.patch import GlideParams
+from .params import shared
+
+# 1, 2, 3, ... : sample numbers counted from the start of a block (grown on demand)
+_STEPS = np.arange(1, BUFFER_SIZE + 1, dtype=np.float64)
+
+
+def glide_steps(n_samples: int) -> np.ndarray:
+    """Exponents 1..n_samples of the per-sample glide factor."""
+    global _STEPS
+    if n_samples > len(_STEPS):
+        _STEPS = np.arange(1, n_samples + 1, dtype=np.float64)
+    return _STEPS[:n_samples]
 
 
 class Glide:
+    time = shared("time")  # seconds
+    mode = shared("mode")  # off, always, legato
+
     def __init__(self):
-        self.time = 0.0         # seconds
-        self.mode = "off"       # off, always, legato
+        self.params = GlideParams()
         self._current_freq = 0.0
         self._target_freq = 0.0
 
@@ -19,18 +34,27 @@ class Glide:
             self._current_freq = freq
             self._target_freq = freq
 
-    def render(self, n_samples: int) -> np.ndarray:
-        """Return per-sample frequency array."""
-        if self.time <= 0.0 or self._current_freq == self._target_freq:
+    @property
+    def gliding(self) -> bool:
+        """True while the frequency is still moving towards the target."""
+        return self.time > 0.0 and self._current_freq != self._target_freq
+
+    def render(self, n_samples: int, out: np.ndarray | None = None) -> np.ndarray:
+        """Return per-sample frequency array (written into `out` when given)."""
+        if out is None:
+            out = np.empty(n_samples, dtype=np.float64)
+        if not self.gliding:
             self._current_freq = self._target_freq
-            return np.full(n_samples, self._target_freq, dtype=np.float64)
+            out.fill(self._target_freq)
+            return out
 
-        out = np.empty(n_samples, dtype=np.float64)
-        # Exponential glide in log-frequency domain
+        # Exponential approach, f[i] = target + (current - target) * (1 - coeff) ** (i + 1):
+        # the closed form of f += (target - f) * coeff applied once per sample
         coeff = 1.0 - np.exp(-1.0 / (self.time * SAMPLE_RATE))
-        for i in range(n_samples):
-            self._current_freq += (self._target_freq - self._current_freq) * coeff
-            out[i] = self._current_freq
+        np.power(1.0 - coeff, glide_steps(n_samples), out=out)
+        out *= self._current_freq - self._target_freq
+        out += self._target_freq
+        self._current_freq = float(out[-1])
 
         if abs(self._current_freq - self._target_freq) < 0.01:
             self._current_freq = self._target_freq
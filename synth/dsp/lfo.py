@@ -1,62 +1,96 @@
 import numpy as np
-from ..config import SAMPLE_RATE, CONTROL_RATE_DIVIDER
+from ..config import SAMPLE_RATE, CONTROL_RATE_DIVIDER, BUFFER_SIZE
+from ..patch.patch import LFOParams
+from .buffers import Scratch
+from .envelope import interpolate_control
+from .params import shared
 
 _TWO_PI = 2.0 * np.pi
 
+# 0, 1, 2, ... : control step numbers (grown on demand)
+_STEPS = np.arange(BUFFER_SIZE // CONTROL_RATE_DIVIDER + 1, dtype=np.float64)
+
+
+def lfo_phases(phase: float, phase_inc: float, out: np.ndarray) -> float:
+    """Phase at each control step, (phase + k * phase_inc) wrapped to 0..1, into `out`.
+
+    Returns the phase after the last step, where the next block continues.
+    """
+    global _STEPS
+    n = out.shape[-1]
+    if n > len(_STEPS):
+        _STEPS = np.arange(n, dtype=np.float64)
+    np.multiply(_STEPS[:n], phase_inc, out=out)
+    out += phase
+    np.remainder(out, 1.0, out=out)
+    return (phase + n * phase_inc) % 1.0
+
+
+def lfo_shape(waveform: str, phase: np.ndarray) -> np.ndarray:
+    """Replace phases (0..1) in place by the waveform's value (-1..+1)."""
+    if waveform == "sine":
+        phase *= _TWO_PI
+        np.sin(phase, out=phase)
+    elif waveform == "triangle":
+        phase -= 0.5
+        np.abs(phase, out=phase)
+        phase *= 4.0
+        phase -= 1.0
+    elif waveform == "saw":
+        phase *= 2.0
+        phase -= 1.0
+    elif waveform == "square":
+        # +1 below half a cycle, -1 from there on
+        phase -= 0.5
+        np.copysign(1.0, phase, out=phase)
+        np.negative(phase, out=phase)
+    else:
+        phase.fill(0.0)
+    return phase
+
 
 class LFO:
-    def __init__(self):
-        self.waveform = "sine"    # sine, triangle, saw, square
-        self.rate = 1.0           # Hz
-        self.depth = 0.0          # 0..1
-        self.destination = "filter"  # filter, pitch, amp
-        self.key_sync = True
+    waveform = shared("waveform")        # sine, triangle, saw, square
+    rate = shared("rate")                # Hz
+    depth = shared("depth")              # 0..1
+    destination = shared("destination")  # filter, pitch, amp
+    key_sync = shared("key_sync")
+
+    def __init__(self, dtype=np.float64):
+        self.params = LFOParams()
         self._phase = 0.0
+        self.dtype = np.dtype(dtype)
+        size = BUFFER_SIZE // CONTROL_RATE_DIVIDER + 1
+        self._steps = Scratch(1, size=size)  # phases and shape values in double precision
+        self._ctrl = Scratch(1, dtype, size=size)
+        self._work = Scratch(2, dtype)
 
-    def render(self, n_samples: int) -> np.ndarray:
+    def render(self, n_samples: int, out: np.ndarray | None = None) -> np.ndarray:
         """Return modulation signal (-1..+1) * depth at audio rate."""
+        if out is None:
+            out = np.empty(n_samples, dtype=self.dtype)
         if self.depth <= 0.0:
-            return np.zeros(n_samples, dtype=np.float64)
+            out.fill(0.0)
+            return out
 
         # Generate at control rate, then interpolate
         n_blocks = n_samples // CONTROL_RATE_DIVIDER
         remainder = n_samples % CONTROL_RATE_DIVIDER
         total = n_blocks + (1 if remainder else 0)
 
-        ctrl = np.empty(total, dtype=np.float64)
+        values = self._steps(total)[0]
         phase_inc = self.rate * CONTROL_RATE_DIVIDER / SAMPLE_RATE
+        self._phase = lfo_phases(self._phase, phase_inc, values)
+        lfo_shape(self.waveform, values)
+        if self.dtype == np.float64:
+            ctrl = values
+        else:
+            ctrl = self._ctrl(total)[0]
+            np.copyto(ctrl, values, casting="same_kind")
 
-        for i in range(total):
-            ctrl[i] = self._sample(self._phase)
-            self._phase += phase_inc
-            if self._phase >= 1.0:
-                self._phase -= 1.0
-
-        # Interpolate to audio rate
-        out = np.empty(n_samples, dtype=np.float64)
-        pos = 0
-        for i in range(total):
-            bs = CONTROL_RATE_DIVIDER if i < n_blocks else remainder
-            if bs == 0:
-                continue
-            if i == 0:
-                out[pos:pos + bs] = ctrl[i]
-            else:
-                out[pos:pos + bs] = np.linspace(ctrl[i - 1], ctrl[i], bs, endpoint=False)
-            pos += bs
-
-        return out * self.depth
-
-    def _sample(self, phase: float) -> float:
-        if self.waveform == "sine":
-            return np.sin(_TWO_PI * phase)
-        elif self.waveform == "triangle":
-            return 4.0 * abs(phase - 0.5) - 1.0
-        elif self.waveform == "saw":
-            return 2.0 * phase - 1.0
-        elif self.waveform == "square":
-            return 1.0 if phase < 0.5 else -1.0
-        return 0.0
+        interpolate_control(ctrl, n_samples, out, self._work(n_samples))
+        out *= self.depth
+        return out
 
     def reset(self):
         self._phase = 0.0
@@ -1,47 +1,102 @@
 import numpy as np
 
+try:
+    import numba
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+from ..patch.patch import NoiseParams
+from .buffers import Scratch
+from .params import shared
+
+
+def make_rng(seed: int | np.random.SeedSequence | None = None) -> np.random.Generator:
+    """A PCG64 generator for noise; seed=None draws fresh OS entropy."""
+    return np.random.Generator(np.random.PCG64(seed))
+
+
+def uniform_noise(out: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """Fill `out` (float64) with white noise in [-1, 1) drawn from `rng`.
+
+    The draws are always double precision, so a float32 voice hears the same
+    stream as a float64 one, rounded.
+    """
+    rng.random(out=out, dtype=out.dtype)
+    out *= 2.0
+    out -= 1.0
+    return out
+
+
+if HAS_NUMBA:
+    @numba.jit(nopython=True, nogil=True, cache=True)
+    def _pink_filter(white, state, out):
+        """Paul Kellet's pink noise filter over `white`, into `out`; state is (7,)."""
+        b0, b1, b2, b3, b4, b5, b6 = state[0], state[1], state[2], state[3], state[4], state[5], state[6]
+        for i in range(len(white)):
+            w = white[i]
+            b0 = 0.99886 * b0 + w * 0.0555179
+            b1 = 0.99332 * b1 + w * 0.0750759
+            b2 = 0.96900 * b2 + w * 0.1538520
+            b3 = 0.86650 * b3 + w * 0.3104856
+            b4 = 0.55000 * b4 + w * 0.5329522
+            b5 = -0.7616 * b5 - w * 0.0168980
+            out[i] = b0 + b1 + b2 + b3 + b4 + b5 + b6 + w * 0.5362
+            b6 = w * 0.115926
+        state[0], state[1], state[2], state[3] = b0, b1, b2, b3
+        state[4], state[5], state[6] = b4, b5, b6
+        return out
+else:
+    def _pink_filter(white, state, out):
+        """Pure-Python fallback (slower)."""
+        b0, b1, b2, b3, b4, b5, b6 = (float(b) for b in state)
+        for i in range(len(white)):
+            w = float(white[i])
+            b0 = 0.99886 * b0 + w * 0.0555179
+            b1 = 0.99332 * b1 + w * 0.0750759
+            b2 = 0.96900 * b2 + w * 0.1538520
+            b3 = 0.86650 * b3 + w * 0.3104856
+            b4 = 0.55000 * b4 + w * 0.5329522
+            b5 = -0.7616 * b5 - w * 0.0168980
+            out[i] = b0 + b1 + b2 + b3 + b4 + b5 + b6 + w * 0.5362
+            b6 = w * 0.115926
+        state[:] = (b0, b1, b2, b3, b4, b5, b6)
+        return out
+
 
 class NoiseGenerator:
-    def __init__(self):
-        self.noise_type = "white"  # white | pink
-        self.level = 0.0
-        # Pink noise state (Paul Kellet's approximation)
-        self._b0 = 0.0
-        self._b1 = 0.0
-        self._b2 = 0.0
-        self._b3 = 0.0
-        self._b4 = 0.0
-        self._b5 = 0.0
-        self._b6 = 0.0
-
-    def render(self, n_samples: int) -> np.ndarray:
+    noise_type = shared("noise_type")  # white | pink
+    level = shared("level")
+
+    def __init__(self, dtype=np.float64, rng: np.random.Generator | None = None):
+        self.params = NoiseParams()
+        # Shared with the other voices of the channel, so a seeded engine renders
+        # the same noise every time
+        self.rng = rng if rng is not None else make_rng()
+        # Pink noise state b0..b6 (Paul Kellet's approximation), kept in double precision
+        self._pink = np.zeros(7, dtype=np.float64)
+        self.dtype = np.dtype(dtype)
+        self._white = Scratch(1)  # float64 draws, cast into `out`
+
+    def render(self, n_samples: int, out: np.ndarray | None = None) -> np.ndarray:
+        if out is None:
+            out = np.empty(n_samples, dtype=self.dtype)
         if self.level <= 0.0:
-            return np.zeros(n_samples, dtype=np.float64)
+            out.fill(0.0)
+            return out
 
-        white = np.random.uniform(-1.0, 1.0, n_samples)
+        white = uniform_noise(self._white(n_samples)[0], self.rng)
 
         if self.noise_type == "pink":
-            out = np.empty(n_samples, dtype=np.float64)
-            b0, b1, b2, b3, b4, b5, b6 = (
-                self._b0, self._b1, self._b2, self._b3, self._b4, self._b5, self._b6,
-            )
-            for i in range(n_samples):
-                w = white[i]
-                b0 = 0.99886 * b0 + w * 0.0555179
-                b1 = 0.99332 * b1 + w * 0.0750759
-                b2 = 0.96900 * b2 + w * 0.1538520
-                b3 = 0.86650 * b3 + w * 0.3104856
-                b4 = 0.55000 * b4 + w * 0.5329522
-                b5 = -0.7616 * b5 - w * 0.0168980
-                out[i] = b0 + b1 + b2 + b3 + b4 + b5 + b6 + w * 0.5362
-                b6 = w * 0.115926
-            self._b0, self._b1, self._b2, self._b3 = b0, b1, b2, b3
-            self._b4, self._b5, self._b6 = b4, b5, b6
+            _pink_filter(white, self._pink, out)
             out *= 0.11  # Normalize
-            return out * self.level
+            out *= self.level
+        elif out.dtype == white.dtype:
+            np.multiply(white, self.level, out=out)
         else:
-            return white * self.level
+            white *= self.level
+            np.copyto(out, white)  # (casts without a temporary)
+        return out
 
     def reset(self):
-        self._b0 = self._b1 = self._b2 = self._b3 = 0.0
-        self._b4 = self._b5 = self._b6 = 0.0
+        self._pink[:] = 0.0
@@ -1,80 +1,184 @@
+from bisect import bisect_right
 import numpy as np
-from ..config import SAMPLE_RATE, WAVETABLE_SIZE
+from ..config import SAMPLE_RATE, WAVETABLE_SIZE, WAVETABLE_MIP_BASE, WAVETABLE_MIPS_PER_OCTAVE
+from ..patch.patch import OscParams
+from .buffers import Scratch
+from .params import shared
+from .exp2 import semitone_ratio
+from .table_cache import load_or_build
 
-# Pre-computed wavetables (band-limited via additive synthesis)
-_TABLES: dict[str, np.ndarray] = {}
+# Pre-computed wavetables, band-limited by additive synthesis. Each waveform
+# has one table per mip level; level k holds every harmonic below Nyquist
+# for fundamentals up to MIP_EDGES[k], so picking the level by pitch keeps
+# the lookup alias-free at the cost of a single table read.
+WAVEFORMS = ["sine", "saw", "square", "triangle"]
+_TABLE_VERSION = 2  # bump whenever WAVEFORMS or _build_tables() output changes
 
 
-def _build_tables():
-    phase = np.linspace(0.0, 1.0, WAVETABLE_SIZE, endpoint=False, dtype=np.float64)
+def _mip_edges() -> np.ndarray:
+    """Upper fundamental frequency of each mip level but the last (which is open-ended)."""
+    edges = []
+    k = 1
+    while True:
+        edge = WAVETABLE_MIP_BASE * 2.0 ** (k / WAVETABLE_MIPS_PER_OCTAVE)
+        if edge * 2.0 > SAMPLE_RATE / 2.0:  # next level would hold only the fundamental
+            break
+        edges.append(edge)
+        k += 1
+    return np.array(edges, dtype=np.float64)
+
+
+MIP_EDGES = _mip_edges()
+MIP_LEVELS = len(MIP_EDGES) + 1
+_MIP_EDGE_LIST = MIP_EDGES.tolist()
+
+
+def mip_level(freq: float) -> int:
+    """Mip level whose tables are alias-free for a peak fundamental of `freq` Hz."""
+    return bisect_right(_MIP_EDGE_LIST, freq)
+
+
+def _harmonic_limits() -> np.ndarray:
+    """Highest harmonic per mip level: below Nyquist at the level's top frequency."""
+    tops = np.append(MIP_EDGES, SAMPLE_RATE / 2.0)
+    limits = np.floor(SAMPLE_RATE / 2.0 / tops).astype(np.int64)
+    return np.clip(limits, 1, WAVETABLE_SIZE // 2 - 1)
+
+
+def _build_tables() -> np.ndarray:
+    """All tables as one (len(WAVEFORMS), MIP_LEVELS, WAVETABLE_SIZE) array.
+
+    Waveforms are in WAVEFORMS order. Each table is the sine series of its
+    waveform, truncated at the level's harmonic limit and synthesised with
+    one inverse FFT.
+    """
+    k = np.arange(WAVETABLE_SIZE // 2 + 1, dtype=np.float64)
+    odd = (k % 2) == 1
+    with np.errstate(divide="ignore"):
+        inv_k = np.where(k > 0, 1.0 / k, 0.0)
+    amps = np.zeros((len(WAVEFORMS), len(k)), dtype=np.float64)
     # Sine
-    _TABLES["sine"] = np.sin(2.0 * np.pi * phase)
-    # Saw – additive (enough harmonics for audible range)
-    saw = np.zeros(WAVETABLE_SIZE, dtype=np.float64)
-    for k in range(1, 64):
-        saw += ((-1.0) ** (k + 1)) * np.sin(2.0 * np.pi * k * phase) / k
-    _TABLES["saw"] = saw * (2.0 / np.pi)
+    amps[0, 1] = 1.0
+    # Saw – all harmonics, alternating sign
+    amps[1] = np.where(k % 2 == 1, 1.0, -1.0) * inv_k * (2.0 / np.pi)
     # Square – odd harmonics
-    sq = np.zeros(WAVETABLE_SIZE, dtype=np.float64)
-    for k in range(1, 64, 2):
-        sq += np.sin(2.0 * np.pi * k * phase) / k
-    _TABLES["square"] = sq * (4.0 / np.pi)
+    amps[2] = np.where(odd, inv_k, 0.0) * (4.0 / np.pi)
     # Triangle – odd harmonics, alternating sign
-    tri = np.zeros(WAVETABLE_SIZE, dtype=np.float64)
-    for k in range(1, 64, 2):
-        sign = (-1.0) ** ((k - 1) // 2)
-        tri += sign * np.sin(2.0 * np.pi * k * phase) / (k * k)
-    _TABLES["triangle"] = tri * (8.0 / (np.pi * np.pi))
+    tri_sign = np.where((k - 1) % 4 == 0, 1.0, -1.0)
+    amps[3] = np.where(odd, tri_sign * inv_k * inv_k, 0.0) * (8.0 / (np.pi * np.pi))
+    amps[:, 0] = 0.0
+
+    in_band = k[None, :] <= _harmonic_limits()[:, None]  # (levels, bins)
+    # sum(a_k * sin(2πkn/N)) is the inverse real FFT of -i * a_k * N / 2
+    spectrum = amps[:, None, :] * in_band[None, :, :] * (-0.5j * WAVETABLE_SIZE)
+    return np.fft.irfft(spectrum, n=WAVETABLE_SIZE, axis=-1)
+
+
+# Built once, then memory-mapped from the table cache by every later import
+_TABLE_KEY = (f"v{_TABLE_VERSION}", WAVETABLE_SIZE, f"sr{SAMPLE_RATE}",
+              f"mip{WAVETABLE_MIP_BASE:g}x{WAVETABLE_MIPS_PER_OCTAVE}")
+TABLE_STACK = load_or_build("wavetables", _TABLE_KEY + ("float64",), _build_tables)
+# Single-precision copies for the float32 render mode
+TABLE_STACK_F32 = load_or_build("wavetables", _TABLE_KEY + ("float32",),
+                                lambda: TABLE_STACK.astype(np.float32))
 
+# waveform -> (MIP_LEVELS, WAVETABLE_SIZE) views into the stacks
+_TABLES: dict[str, np.ndarray] = dict(zip(WAVEFORMS, TABLE_STACK))
+_TABLES_F32: dict[str, np.ndarray] = dict(zip(WAVEFORMS, TABLE_STACK_F32))
 
-_build_tables()
 
-WAVEFORMS = list(_TABLES.keys())
+def osc_ratio(octave: int, semitone: float, detune: float) -> float:
+    """Frequency multiplier from octave, semitone and detune (cents)."""
+    return semitone_ratio(12.0 * octave + semitone + detune / 100.0)
 
 
 class Oscillator:
-    def __init__(self):
-        self.waveform: str = "saw"
-        self.octave: int = 0          # -2..+2
-        self.semitone: int = 0        # -12..+12
-        self.detune: float = 0.0      # cents
-        self.level: float = 1.0
-        self.pulse_width: float = 0.5  # for future PWM
+    waveform = shared("waveform")
+    octave = shared("octave")            # -2..+2
+    semitone = shared("semitone")        # -12..+12
+    detune = shared("detune")            # cents
+    level = shared("level")
+    pulse_width = shared("pulse_width")  # for future PWM
+
+    def __init__(self, dtype=np.float64):
+        self.params = OscParams()
         self.phase: float = 0.0       # 0..1 accumulator
+        self.dtype = np.dtype(dtype)
+        self._tables = _TABLES_F32 if self.dtype == np.float32 else _TABLES
+        self._phase_work = Scratch(3)
+        self._work = Scratch(3, dtype)
+        self._index = Scratch(2, dtype=np.intp)
+
+    @property
+    def ratio(self) -> float:
+        """Frequency multiplier from octave, semitone and detune."""
+        return osc_ratio(self.octave, self.semitone, self.detune)
+
+    def render(self, freq: float | np.ndarray, n_samples: int,
+               out: np.ndarray | None = None) -> np.ndarray:
+        """Render n_samples at the given base frequency (Hz). Returns a mono array.
 
-    def render(self, freq: float, n_samples: int, pitch_mod: np.ndarray | None = None) -> np.ndarray:
-        """Render n_samples at the given base frequency (Hz). Returns mono float64 array."""
+        `freq` is a constant or a per-sample array (a glide or pitch
+        modulation, already applied by the voice), in float64.
+        Writes into `out` when given; all intermediates live in preallocated
+        scratch rows.
+        """
+        if out is None:
+            out = np.empty(n_samples, dtype=self.dtype)
         # Apply octave, semitone, detune
-        f = freq * (2.0 ** self.octave) * (2.0 ** (self.semitone / 12.0)) * (2.0 ** (self.detune / 1200.0))
+        ratio = self.ratio
+        per_sample = isinstance(freq, np.ndarray)
         if self.level <= 0.0:
-            return np.zeros(n_samples, dtype=np.float64)
+            out.fill(0.0)
+            return out
 
-        table = _TABLES.get(self.waveform, _TABLES["saw"])
+        tables = self._tables.get(self.waveform, self._tables["saw"])
         ts = WAVETABLE_SIZE
+        # The phase ramp is always built in double precision: a float32 running
+        # sum would drift audibly against the table edges. Lookup and
+        # interpolation run in the voice's dtype.
+        increments, cumulative, phases = self._phase_work(n_samples)
+        frac, lo, hi = self._work(n_samples)
+        idx_i, idx_next = self._index(n_samples)
 
         # Phase increment per sample
-        if pitch_mod is not None:
-            # pitch_mod in semitones
-            freqs = f * (2.0 ** (pitch_mod / 12.0))
-            increments = freqs / SAMPLE_RATE
+        if per_sample:
+            np.multiply(freq, ratio, out=increments)
+            peak = float(increments.max())
+            increments /= SAMPLE_RATE
         else:
-            increments = np.full(n_samples, f / SAMPLE_RATE, dtype=np.float64)
+            f = freq * ratio
+            increments.fill(f / SAMPLE_RATE)
+            peak = f
+        table = tables[mip_level(peak)]
 
         # Build phase ramp (vectorized)
         # phases[i] is the phase at sample i, before adding increments[i]
-        cumulative = np.cumsum(increments)
-        phases = (self.phase + cumulative - increments) % 1.0
+        np.cumsum(increments, out=cumulative)
+        np.add(cumulative, self.phase, out=phases)
+        phases -= increments
+        np.remainder(phases, 1.0, out=phases)
         self.phase = float((self.phase + cumulative[-1]) % 1.0)
 
         # Wavetable lookup with linear interpolation
-        idx_f = phases * ts
-        idx_i = idx_f.astype(np.int32)
-        frac = idx_f - idx_i
-        idx_next = (idx_i + 1) % ts
-        idx_i = idx_i % ts
-        out = table[idx_i] * (1.0 - frac) + table[idx_next] * frac
-
-        return out * self.level
+        # (intp indices and mode="clip" keep np.take from copying; indices are in range)
+        phases *= ts  # fractional table index
+        whole = increments  # free again
+        np.floor(phases, out=whole)
+        np.copyto(idx_i, whole, casting="unsafe")
+        np.subtract(phases, whole, out=whole)
+        np.copyto(frac, whole, casting="same_kind")
+        np.add(idx_i, 1, out=idx_next)
+        np.remainder(idx_next, ts, out=idx_next)
+        np.remainder(idx_i, ts, out=idx_i)
+        np.take(table, idx_i, out=lo, mode="clip")
+        np.subtract(1.0, frac, out=hi)
+        lo *= hi
+        np.take(table, idx_next, out=hi, mode="clip")
+        hi *= frac
+        np.add(lo, hi, out=out)
+        out *= self.level
+        return out
 
     def reset_phase(self):
         self.phase = 0.0
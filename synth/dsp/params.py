@@ -0,0 +1,15 @@
+def shared(name: str) -> property:
+    """Attribute stored in the object's `params` block instead of on the object.
+
+    DSP objects keep their user-facing settings in a parameter block, one of
+    the patch's dataclasses. A channel points every voice at the blocks of its
+    patch, so setting a patch field reaches all voices with one write and
+    nothing is copied per voice or per note.
+    """
+    def get(self):
+        return getattr(self.params, name)
+
+    def set(self, value):
+        setattr(self.params, name, value)
+
+    return property(get, set)
@@ -0,0 +1,42 @@
+import os
+import numpy as np
+from ..config import TABLE_CACHE_DIR
+
+
+def cache_path(name: str, key: tuple) -> str | None:
+    """File for a cached table, e.g. <cache dir>/wavetables-v2-2048-sr44100-mip20x2-float64.npy.
+
+    Returns None when caching is disabled.
+    """
+    if not TABLE_CACHE_DIR:
+        return None
+    return os.path.join(TABLE_CACHE_DIR, "-".join([name, *map(str, key)]) + ".npy")
+
+
+def load_or_build(name: str, key: tuple, build) -> np.ndarray:
+    """Return the array `build()` produces, persisted on disk and memory-mapped.
+
+    `key` (a tuple of short tokens) must capture everything the contents depend on (a format version,
+    sizes, generator settings): a different key is a different file. The
+    first process builds the array and writes it atomically; later ones map
+    the file read-only, so concurrent engine processes share its pages. Any
+    I/O problem falls back to building in memory.
+    """
+    path = cache_path(name, key)
+    if path is not None:
+        try:
+            return np.load(path, mmap_mode="r").view(np.ndarray)
+        except (OSError, ValueError):
+            pass
+    table = np.ascontiguousarray(build())
+    if path is None:
+        return table
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, table)
+        os.replace(tmp, path)
+        return np.load(path, mmap_mode="r").view(np.ndarray)
+    except OSError:
+        return table
@@ -1,23 +1,85 @@
-import collections
+import time
 import numpy as np
-import sounddevice as sd
-from ..config import SAMPLE_RATE, BUFFER_SIZE, NUM_CHANNELS, MIDI_QUEUE_SIZE
+
+from ..config import (
+    SAMPLE_RATE, BUFFER_SIZE, NUM_CHANNELS, MIDI_QUEUE_SIZE, MAX_VOICES, RENDER_MODES, RENDER_WORKERS,
+    MAX_EVENT_SPLITS, LOOKAHEAD_BLOCKS, PRECISIONS, PRECISION, CULL_POLICY, CPU_BUDGET,
+    SILENCE_DB,
+)
+from ..midi.cc_map import CC_MAP
+from ..midi.event_ring import (
+    EventRing, EVENT_DTYPE, EV_NOTE_ON, EV_NOTE_OFF, EV_CONTROL_CHANGE, encode_message,
+)
+from ..dsp.buffers import Scratch
+from ..dsp.noise import make_rng
 from .channel import Channel
+from .culling import VoiceCuller
+from .render_pool import ChannelRenderPool
+from .render_thread import LookaheadRenderer
+from .profiler import StageProfiler
+from .stats import CallbackStats
 
 
 class AudioEngine:
     """Master audio engine: manages channels, processes MIDI queue, drives audio output."""
 
-    def __init__(self):
-        self.channels = [Channel(i) for i in range(NUM_CHANNELS)]
-        self.midi_queue: collections.deque = collections.deque(maxlen=MIDI_QUEUE_SIZE)
-        self._stream: sd.OutputStream | None = None
+    def __init__(self, render_mode: str = "voice", max_voices: int = MAX_VOICES,
+                 render_workers: int = RENDER_WORKERS, lookahead: int = LOOKAHEAD_BLOCKS,
+                 precision: str = PRECISION, seed: int | None = None,
+                 cull_policy: str = CULL_POLICY, cpu_budget: float = CPU_BUDGET,
+                 silence_db: float = SILENCE_DB):
+        if render_mode not in RENDER_MODES:
+            raise ValueError(f"Unknown render mode: {render_mode} (expected one of {RENDER_MODES})")
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown precision: {precision} (expected one of {PRECISIONS})")
+        self.render_mode = render_mode
+        # float32: voice buffers, wavetables and mixing in single precision (ladder state stays float64)
+        self.precision = precision
+        self.dtype = np.dtype(precision)
+        # Each channel draws noise from its own PCG64 stream spawned from `seed`:
+        # a seeded engine renders the same output every time, also with the
+        # channels on worker threads. seed=None picks a fresh one.
+        seeds = np.random.SeedSequence(seed)
+        self.seed = seeds.entropy
+        self.channels = [Channel(i, max_voices, render_mode, self.dtype, make_rng(s))
+                         for i, s in enumerate(seeds.spawn(NUM_CHANNELS))]
+        self.render_workers = render_workers
+        self._pool: ChannelRenderPool | None = None
+        # One single-producer ring per producing thread: MIDI input, and the UI (GUI/REPL/scripts)
+        self.midi_ring = EventRing(MIDI_QUEUE_SIZE)
+        self.ui_ring = EventRing(MIDI_QUEUE_SIZE)
+        self._event_buf = np.zeros(2 * MIDI_QUEUE_SIZE, dtype=EVENT_DTYPE)
+        self._event_offsets = np.zeros(2 * MIDI_QUEUE_SIZE, dtype=np.int64)
+        self._last_callback_time: float | None = None
+        # lookahead > 0: a render thread fills this many blocks ahead of the callback
+        self.lookahead = lookahead
+        self._lookahead: LookaheadRenderer | None = None
+        self._stats = CallbackStats()
+        # Live blocks over cpu_budget fade voices out instead of missing the deadline
+        self.culler = VoiceCuller(cull_policy, cpu_budget)
+        self.profiler = StageProfiler()
+        self._stream = None
         self._running = False
         self._master_volume = 0.8
         self._peak_level = 0.0
+        # Release tails below this (dB of the engine's output) are retired early
+        self._silence_db = silence_db
+        self._update_silence()
+        # Block and per-channel buffers reused by every render
+        self._block_buf = Scratch(1, self.dtype)
+        self._channel_bufs = Scratch(NUM_CHANNELS, self.dtype)
 
     def start(self):
+        # sounddevice is only needed for live playback — offline rendering works
+        # without it — so it is imported here rather than with the engine
+        try:
+            import sounddevice as sd
+        except (ImportError, OSError):
+            raise RuntimeError("sounddevice is not installed (pip install sounddevice)") from None
         self._running = True
+        if self.lookahead > 0:
+            self._lookahead = LookaheadRenderer(self._render_next, self.lookahead, BUFFER_SIZE)
+            self._lookahead.start()
         self._stream = sd.OutputStream(
             samplerate=SAMPLE_RATE,
             blocksize=BUFFER_SIZE,
@@ -34,57 +96,207 @@ class AudioEngine:
             self._stream.stop()
             self._stream.close()
             self._stream = None
+        if self._lookahead is not None:
+            self._lookahead.stop()
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
         for ch in self.channels:
             ch.all_notes_off()
 
     def _audio_callback(self, outdata, frames, time_info, status):
         """Called by sounddevice from the audio thread."""
-        # Drain MIDI queue
-        while self.midi_queue:
-            try:
-                msg = self.midi_queue.popleft()
-            except IndexError:
-                break
-            self._process_midi(msg)
-
-        # Render all channels
-        out = np.zeros(frames, dtype=np.float64)
-        for ch in self.channels:
-            out += ch.render(frames)
+        self._stats.record_status(status)
+        if self._lookahead is not None:
+            self._lookahead.read_into(outdata[:, 0])
+            return
+        outdata[:, 0] = self._render_next(frames)
+
+    def _render_next(self, frames: int) -> np.ndarray:
+        """Collect pending events and render the next block (callback or lookahead thread)."""
+        t0 = time.perf_counter()
+        out = self._render(frames, self._collect_events(time.monotonic(), frames))
+        load = self._stats.record(time.perf_counter() - t0, frames)
+        self.culler.update(self.channels, load, frames)
+        return out
+
+    def _collect_events(self, now: float, frames: int) -> int:
+        """Drain both rings into the event buffer and assign sample offsets.
+
+        Events are timestamped with time.monotonic() by their producer. Those
+        that arrived since the previous callback are placed at the same
+        distance from this block's start as they had from the previous
+        callback, so timing keeps a constant one-block delay instead of up to
+        a block of jitter.
+        """
+        buf = self._event_buf
+        n = self.midi_ring.drain_into(buf)
+        n += self.ui_ring.drain_into(buf[n:])
+        prev = self._last_callback_time
+        self._last_callback_time = now
+        if n:
+            offsets = self._event_offsets[:n]
+            if prev is None:
+                offsets[:] = 0
+            else:
+                offsets[:] = np.clip((buf["timestamp"][:n] - prev) * SAMPLE_RATE, 0, frames - 1)
+        return n
+
+    def _render(self, frames: int, n_events: int = 0) -> np.ndarray:
+        """Render one block of the full channel graph (shared by live and offline paths).
+
+        The first n_events entries of the event buffer are applied in offset
+        order. The block is split at note-ons and at note-offs of held notes,
+        so notes start and stop on the right sample. Every split renders all
+        voices once more, so other events (control changes, note-offs that
+        release nothing) do not split: they take effect at the start of the
+        sub-block they fall in. More than MAX_EVENT_SPLITS distinct note
+        offsets are coarsened onto an even grid to bound the per-split overhead.
+
+        Returns the engine's block buffer, which the next call overwrites.
+        """
+        out = self._block_buf(frames)[0]
+        out.fill(0.0)
+        pos = 0
+        if n_events:
+            buf = self._event_buf
+            offsets = self._event_offsets[:n_events]
+            types = buf["type"]
+            if n_events > MAX_EVENT_SPLITS:
+                notes = types[:n_events] != EV_CONTROL_CHANGE
+                if len(np.unique(offsets[notes])) > MAX_EVENT_SPLITS:
+                    grid = -(-frames // MAX_EVENT_SPLITS)
+                    offsets //= grid
+                    offsets *= grid
+            order = np.argsort(offsets, kind="stable")
+            chans = buf["channel"]
+            data1 = buf["data1"]
+            data2 = buf["data2"]
+            for i in order:
+                off = offsets[i]
+                if off > pos and self._splits_block(types[i], chans[i], data1[i], data2[i]):
+                    self._render_channels(out[pos:off])
+                    pos = off
+                self._apply_event(types[i], chans[i], data1[i], data2[i])
+        if pos < frames:
+            self._render_channels(out[pos:])
 
         out *= self._master_volume
 
         # Soft clip to avoid harsh clipping
-        out = np.tanh(out)
+        np.tanh(out, out=out)
 
         # Measure peak level for VU meter
-        self._peak_level = float(np.max(np.abs(out)))
+        self._peak_level = float(max(out.max(), -out.min()))
+        return out
+
+    def _render_channels(self, out: np.ndarray):
+        """Add all channels into `out` (a slice of the current block)."""
+        frames = len(out)
+        bufs = self._channel_bufs(frames)
+        if self.render_workers > 0:
+            if self._pool is None:
+                self._pool = ChannelRenderPool(self.channels, self.render_workers)
+            self._pool.render(bufs)
+            for buf in bufs:
+                out += buf
+        else:
+            for ch, buf in zip(self.channels, bufs):
+                out += ch.render(frames, buf)
+
+    def render_offline(self, events, duration: float, output: str | None = None,
+                       block_size: int = BUFFER_SIZE) -> np.ndarray:
+        """Render `duration` seconds as fast as the CPU allows, without an audio device.
+
+        events: iterable of (time_seconds, msg) pairs, msg being a message dict
+        such as {"type": "note_on", "channel": 0, "note": 60, "velocity": 100}.
+        Each event is applied at its own sample (time rounded to the nearest
+        sample), exactly like timestamped events in the live callback.
+        Returns mono float32 samples and also writes them as a 16-bit WAV file
+        when `output` is given.
+        """
+        if self._running:
+            raise RuntimeError("Cannot render offline while the audio stream is running")
+        pending = []
+        for t, msg in events:
+            ev = encode_message(msg)
+            if ev is not None:
+                pending.append((int(round(t * SAMPLE_RATE)), ev, t))
+        pending.sort(key=lambda e: e[0])
+        total = int(round(duration * SAMPLE_RATE))
+        result = np.empty(total, dtype=np.float32)
+        buf = self._event_buf
+        offsets = self._event_offsets
 
-        outdata[:, 0] = out.astype(np.float32)
+        ev = 0
+        pos = 0
+        try:
+            while pos < total:
+                frames = min(block_size, total - pos)
+                block_end = pos + frames
+                n = 0
+                while ev < len(pending) and pending[ev][0] < block_end and n < len(buf):
+                    sample, fields, t = pending[ev]
+                    buf[n] = (*fields, t)
+                    offsets[n] = max(sample - pos, 0)
+                    n += 1
+                    ev += 1
+                result[pos:block_end] = self._render(frames, n)
+                pos = block_end
+        finally:
+            # Do not leave the worker threads parked once the render is done
+            if self._pool is not None:
+                self._pool.close()
+                self._pool = None
 
-    def _process_midi(self, msg):
-        """Route a parsed MIDI message to the appropriate channel."""
-        msg_type = msg.get("type")
-        ch_idx = msg.get("channel", 0)
+        if output is not None:
+            from .wav import write_wav
+            write_wav(output, result, SAMPLE_RATE)
+        return result
+
+    def _splits_block(self, ev_type: int, ch_idx: int, data1: int, data2: int) -> bool:
+        """Whether an event must start on its own sample: a note-on, or a note-off that releases a voice."""
+        if ev_type == EV_NOTE_ON and data2 > 0:
+            return True
+        if ev_type == EV_NOTE_ON or ev_type == EV_NOTE_OFF:
+            channel = self.channels[ch_idx if ch_idx < NUM_CHANNELS else 0]
+            return channel.allocator.is_held(int(data1))
+        return False
+
+    def _apply_event(self, ev_type: int, ch_idx: int, data1: int, data2: int):
+        """Route one MIDI event to the appropriate channel."""
         if ch_idx >= NUM_CHANNELS:
             ch_idx = 0
         channel = self.channels[ch_idx]
 
-        if msg_type == "note_on":
-            if msg["velocity"] > 0:
-                channel.note_on(msg["note"], msg["velocity"])
+        if ev_type == EV_NOTE_ON:
+            if data2 > 0:
+                channel.note_on(int(data1), int(data2))
             else:
-                channel.note_off(msg["note"])
-        elif msg_type == "note_off":
-            channel.note_off(msg["note"])
-        elif msg_type == "control_change":
-            self._process_cc(channel, msg["control"], msg["value"])
-        elif msg_type == "pitchwheel":
-            pass  # Could add pitch bend support
+                channel.note_off(int(data1))
+        elif ev_type == EV_NOTE_OFF:
+            channel.note_off(int(data1))
+        elif ev_type == EV_CONTROL_CHANGE:
+            self._process_cc(channel, int(data1), int(data2))
+        # EV_PITCHWHEEL: could add pitch bend support
+
+    # ── Event senders for the UI thread (GUI, REPL, scripts) ──
+
+    def send_note_on(self, channel: int, note: int, velocity: int = 100) -> bool:
+        return self.ui_ring.push(EV_NOTE_ON, channel, note, velocity, time.monotonic())
+
+    def send_note_off(self, channel: int, note: int) -> bool:
+        return self.ui_ring.push(EV_NOTE_OFF, channel, note, 0, time.monotonic())
+
+    def send_cc(self, channel: int, control: int, value: int) -> bool:
+        return self.ui_ring.push(EV_CONTROL_CHANGE, channel, control, value, time.monotonic())
+
+    def event_stats(self) -> dict:
+        """Counters of both event rings (pushed, dropped, pending, high_water)."""
+        return {"midi": self.midi_ring.stats(), "ui": self.ui_ring.stats()}
 
     def _process_cc(self, channel: Channel, cc: int, value: int):
         """Map CC messages to synth parameters."""
-        from ..midi.cc_map import CC_MAP
         normalized = value / 127.0
         if cc in CC_MAP:
             param, min_val, max_val = CC_MAP[cc]
@@ -93,6 +305,42 @@ class AudioEngine:
         elif cc == 120 or cc == 123:  # All Sound Off / All Notes Off
             channel.all_notes_off()
 
+    def stats(self) -> dict:
+        """Render-time and xrun statistics of the live stream.
+
+        load_* values are render time as a fraction of the block duration
+        (1.0 = deadline missed); xruns counts the underflow/overflow flags
+        PortAudio reported, lookahead_underflows the callbacks that found no
+        block ready in lookahead mode. culled_voices counts the voices faded
+        out to stay within the CPU budget, cull_blocks the blocks that did so.
+        """
+        summary = self._stats.summary()
+        summary["lookahead_underflows"] = self.underflows
+        summary["culled_voices"] = self.culler.culled
+        summary["cull_blocks"] = self.culler.cull_blocks
+        summary["cull_policy"] = self.culler.policy
+        summary["cpu_budget"] = self.culler.budget
+        return summary
+
+    def reset_stats(self):
+        self._stats.reset()
+        self.culler.reset()
+
+    def set_profiling(self, enabled: bool):
+        """Turn per-stage DSP timing on or off (adds a few µs per voice-block)."""
+        self.profiler.enabled = enabled
+        for ch in self.channels:
+            ch.set_profiler(self.profiler if enabled else None)
+
+    def profile_report(self) -> dict:
+        """Per-stage render time per channel and patch (see StageProfiler.report)."""
+        return self.profiler.report()
+
+    @property
+    def underflows(self) -> int:
+        """Callbacks that found no rendered block ready (lookahead mode)."""
+        return self._lookahead.underflows if self._lookahead is not None else 0
+
     @property
     def peak_level(self) -> float:
         return self._peak_level
@@ -104,3 +352,21 @@ class AudioEngine:
     @master_volume.setter
     def master_volume(self, value: float):
         self._master_volume = max(0.0, min(1.0, value))
+        self._update_silence()
+
+    @property
+    def silence_db(self) -> float:
+        """Level (dB of the output) below which a releasing voice is retired; -inf disables."""
+        return self._silence_db
+
+    @silence_db.setter
+    def silence_db(self, value: float):
+        self._silence_db = value
+        self._update_silence()
+
+    def _update_silence(self):
+        """Hand the silence threshold to the channels, before the master volume."""
+        level = 10.0 ** (self._silence_db / 20.0)
+        level = level / self._master_volume if self._master_volume > 0.0 else float("inf")
+        for ch in self.channels:
+            ch.silence_level = level
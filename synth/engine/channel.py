@@ -1,30 +1,78 @@
+from functools import lru_cache
 import numpy as np
-from ..config import MAX_VOICES
+from ..config import MAX_VOICES, SILENCE_DB
 from ..patch.patch import Patch
+from ..dsp.buffers import Scratch
+from ..dsp.envelope import RELEASE
+from ..dsp.lfo import LFO
+from ..dsp.noise import NoiseGenerator, make_rng
+from .profiler import STAGES, ST_LFO, ST_NOISE, StageProfiler, lap, perf_counter_ns
 from .voice_allocator import VoiceAllocator
+from .voice_bank import VoiceBank
+
+
+@lru_cache(maxsize=None)
+def _param_path(param: str) -> tuple:
+    """Parsed dotted parameter path: attribute names, 'oscN' as oscillator index N - 1."""
+    parts = param.split(".")
+    return tuple(int(part[-1]) - 1 if part.startswith("osc") and part[-1].isdigit() else part
+                 for part in parts[:-1]) + (parts[-1],)
 
 
 class Channel:
     """A multitimbral channel: owns a patch and a voice allocator."""
 
-    def __init__(self, channel_id: int = 0):
+    def __init__(self, channel_id: int = 0, max_voices: int = MAX_VOICES, render_mode: str = "voice",
+                 dtype=np.float64, rng: np.random.Generator | None = None):
         self.channel_id = channel_id
         self.patch = Patch()
-        self.allocator = VoiceAllocator(MAX_VOICES)
+        self.dtype = np.dtype(dtype)
+        # Noise stream of every voice on this channel (seeded by the engine)
+        self.rng = rng if rng is not None else make_rng()
+        self.allocator = VoiceAllocator(max_voices, dtype, self.rng)
         self.volume = 1.0
-        self._apply_patch()
+        # Releasing voices whose output peak (scaled by volume and the patch's
+        # master volume) stays below this are retired; the engine sets it
+        # from its silence threshold and master volume
+        self.silence_level = 10.0 ** (SILENCE_DB / 20.0)
+        self.render_mode = render_mode
+        self._bank = VoiceBank(self.allocator.voices, fused=render_mode == "fused", rng=self.rng,
+                               active=self.allocator.active)
+        self.profiler: StageProfiler | None = None
+        self._stage_ns: list[int] | None = None
+        self._voice_buf = Scratch(1, dtype)
+        # Free-running LFO shared by all voices when the patch turns key sync off
+        self.lfo = LFO(dtype)
+        self._lfo_buf = Scratch(1, dtype)
+        # One noise source for all voices when the patch shares noise
+        self.noise = NoiseGenerator(dtype, self.rng)
+        self._noise_buf = Scratch(1, dtype)
+        self._bind_patch()
+
+    def set_profiler(self, profiler: StageProfiler | None):
+        """Attach (or detach with None) a stage profiler to this channel's voices."""
+        self.profiler = profiler
+        self._stage_ns = [0] * len(STAGES) if profiler is not None else None
+        for voice in self.allocator.voices:
+            voice.stage_ns = self._stage_ns
 
     def set_patch(self, patch: Patch):
         self.patch = patch
-        self._apply_patch()
+        self._bind_patch()
+
+    def _bind_patch(self):
+        """Point the voices, LFO and noise at the patch's parameter blocks.
 
-    def _apply_patch(self):
+        Needed only when the patch (or one of its sections) is replaced:
+        edits to its fields are seen by every voice as they happen.
+        """
         for voice in self.allocator.voices:
-            voice.apply_patch(self.patch)
+            voice.bind_patch(self.patch)
+        self.lfo.params = self.patch.lfo
+        self.noise.params = self.patch.noise
 
     def note_on(self, note: int, velocity: int):
-        v = self.allocator.note_on(note, velocity)
-        v.apply_patch(self.patch)
+        self.allocator.note_on(note, velocity)
 
     def note_off(self, note: int):
         self.allocator.note_off(note)
@@ -33,22 +81,65 @@ class Channel:
         self.allocator.all_notes_off()
 
     def set_param(self, param: str, value: float):
-        """Set a patch parameter by dotted path, e.g. 'filter.cutoff'."""
-        parts = param.split(".")
+        """Set a patch parameter by dotted path, e.g. 'filter.cutoff'.
+
+        One attribute write, whatever the number of voices: they all read
+        the patch's parameter blocks.
+        """
+        *path, name = _param_path(param)
         obj = self.patch
-        for part in parts[:-1]:
-            if part.startswith("osc") and part[-1].isdigit():
-                idx = int(part[-1]) - 1
-                obj = obj.oscillators[idx]
-            else:
-                obj = getattr(obj, part)
-        setattr(obj, parts[-1], value)
-        # Re-apply to all voices
-        self._apply_patch()
-
-    def render(self, n_samples: int) -> np.ndarray:
-        out = np.zeros(n_samples, dtype=np.float64)
-        for voice in self.allocator.voices:
-            if voice.active:
-                out += voice.render(n_samples)
-        return out * self.volume * self.patch.master_volume
+        for step in path:
+            obj = obj.oscillators[step] if isinstance(step, int) else getattr(obj, step)
+        setattr(obj, name, value)
+
+    def render(self, n_samples: int, out: np.ndarray | None = None) -> np.ndarray:
+        """Render one block of this channel (into `out` when given)."""
+        if out is None:
+            out = np.empty(n_samples, dtype=self.dtype)
+        stage_ns = self._stage_ns
+        if stage_ns is not None:
+            t0 = perf_counter_ns()
+            n_active = len(self.allocator.active)
+
+        # Without key sync one LFO runs for the whole channel, whether or not
+        # any voice sounds, and every voice reads the same signal
+        lfo = None
+        lfo_phase = self.lfo._phase
+        if not self.lfo.key_sync and self.lfo.depth > 0.0:
+            lfo = self.lfo.render(n_samples, self._lfo_buf(n_samples)[0])
+            if stage_ns is not None:
+                lap(stage_ns, ST_LFO, t0)
+
+        # Shared noise is drawn and filtered once for the block
+        noise = None
+        if self.patch.noise.shared and self.noise.level > 0.0 and self.allocator.active:
+            if stage_ns is not None:
+                t = perf_counter_ns()
+            noise = self.noise.render(n_samples, self._noise_buf(n_samples)[0])
+            if stage_ns is not None:
+                lap(stage_ns, ST_NOISE, t)
+
+        # The silence threshold at the voices' own output level
+        gain = self.volume * self.patch.master_volume
+        silence = self.silence_level / gain if gain > 0.0 else float("inf")
+
+        if self.render_mode in ("bank", "fused"):
+            self._bank.render(self.patch, n_samples, stage_ns, out, lfo, lfo_phase, noise, silence)
+        else:
+            out.fill(0.0)
+            voice_buf = self._voice_buf(n_samples)[0]
+            voices = self.allocator.voices
+            for i in self.allocator.active:
+                voice = voices[i]
+                buf = voice.render(n_samples, voice_buf, lfo, noise)
+                out += buf
+                # Block-peak check, only on release tails
+                if voice.amp_env._state == RELEASE and max(buf.max(), -buf.min()) < silence:
+                    voice.active = False
+        self.allocator.release_finished()
+        out *= self.volume
+        out *= self.patch.master_volume
+        if stage_ns is not None:
+            self.profiler.collect(self.channel_id, self.patch.name, stage_ns,
+                                  perf_counter_ns() - t0, n_active, n_samples)
+        return out
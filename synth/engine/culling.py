@@ -0,0 +1,104 @@
+import math
+import numpy as np
+from ..config import (
+    SAMPLE_RATE, CULL_POLICIES, CULL_POLICY, CPU_BUDGET, CULL_THRESHOLD_DB, CULL_FADE_MS, CULL_AFTER_BLOCKS,
+)
+from ..dsp.envelope import RELEASE
+
+# Length of a culled voice's fade-out in samples, and its gain curve: a voice
+# with r samples of fade left plays sample s at gain (r - 1 - s) / CULL_FADE
+CULL_FADE = max(1, int(round(SAMPLE_RATE * CULL_FADE_MS / 1000.0)))
+_FADE_RAMP = np.arange(CULL_FADE - 1, -1, -1, dtype=np.float64) / CULL_FADE
+# For this many samples after a cull, overload counts as sustained at once
+_ARMED = SAMPLE_RATE // 2
+
+
+def fade_out(out: np.ndarray, remaining: int) -> int:
+    """Apply the cull fade in place to one voice's block; returns the samples of fade left."""
+    start = CULL_FADE - remaining
+    m = min(remaining, len(out))
+    out[:m] *= _FADE_RAMP[start:start + m]
+    out[m:] = 0.0
+    return remaining - m
+
+
+class VoiceCuller:
+    """Keeps live rendering inside its CPU budget by fading voices out.
+
+    After every live block the engine reports the block's load (render time
+    over block duration). Only sustained overload culls: once `after_blocks`
+    blocks in a row ran over `budget`, enough voices to bring the lowest of
+    those loads back under it (estimated from the voice count) get a
+    CULL_FADE-sample fade and then stop. For half a second after a cull the
+    overload is known to be real, so any block over budget culls by its own
+    load. A single slow block (a GC pause, a first-call compile) culls
+    nothing. Victims are taken in the order of the policy:
+
+    - "releasing" (default): voices in their release stage first, quietest
+      first, then the quietest held ones;
+    - "quietest": lowest current level (amp envelope × velocity) first;
+    - "inaudible": only voices below `threshold_db`, quietest first;
+    - "off": never cull.
+
+    No further voices are culled until the previous fades have finished.
+    """
+
+    def __init__(self, policy: str = CULL_POLICY, budget: float = CPU_BUDGET,
+                 threshold_db: float = CULL_THRESHOLD_DB, after_blocks: int = CULL_AFTER_BLOCKS):
+        if policy not in CULL_POLICIES:
+            raise ValueError(f"Unknown cull policy: {policy} (expected one of {CULL_POLICIES})")
+        self.policy = policy
+        self.budget = budget
+        self.threshold = 10.0 ** (threshold_db / 20.0)
+        self.after_blocks = max(1, after_blocks)
+        self._hold = 0  # samples until the last culled voices are silent
+        self._over = 0  # consecutive blocks over budget
+        self._over_load = 0.0  # lowest load of those blocks
+        self._armed = 0  # samples left in which one block over budget is enough
+        self.reset()
+
+    def reset(self):
+        self.culled = 0         # voices faded out
+        self.cull_blocks = 0    # blocks over budget that culled at least one voice
+
+    def update(self, channels: list, load: float, frames: int) -> int:
+        """Cull voices if the block just rendered ran over budget; returns how many."""
+        self._armed = max(self._armed - frames, 0)
+        if self._hold > 0:
+            self._hold -= frames
+            return 0
+        if self.policy == "off" or load <= self.budget:
+            self._over = 0
+            return 0
+        if not self._armed:
+            self._over += 1
+            self._over_load = load if self._over == 1 else min(self._over_load, load)
+            if self._over < self.after_blocks:
+                return 0
+            self._over = 0
+            load = self._over_load  # a spike among them does not inflate the estimate
+        candidates = []
+        for ch in channels:
+            voices = ch.allocator.voices
+            for i in ch.allocator.active:
+                v = voices[i]
+                if v.active and not v.fade:
+                    candidates.append((v.amp_env._level * v.velocity, v))
+        if not candidates:
+            return 0
+        n = max(1, math.ceil(len(candidates) * (1.0 - self.budget / load)))
+        if self.policy == "releasing":
+            candidates.sort(key=lambda c: (c[1].amp_env._state != RELEASE, c[0]))
+        else:
+            candidates.sort(key=lambda c: c[0])
+            if self.policy == "inaudible":
+                candidates = [c for c in candidates if c[0] < self.threshold]
+        victims = candidates[:n]
+        for _, v in victims:
+            v.cull(CULL_FADE)
+        if victims:
+            self.culled += len(victims)
+            self.cull_blocks += 1
+            self._hold = CULL_FADE
+            self._armed = _ARMED
+        return len(victims)
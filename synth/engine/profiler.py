@@ -0,0 +1,89 @@
+import json
+from time import perf_counter_ns
+
+# Stages timed inside Voice.render / VoiceBank.render; "mix" is the channel's
+# own overhead (voice loop, summing, gain), "fused" the compiled kernel.
+STAGES = ("amp_env", "filter_env", "lfo", "glide", "oscillators", "noise",
+          "filter", "vca", "fused", "mix")
+(ST_AMP_ENV, ST_FILTER_ENV, ST_LFO, ST_GLIDE, ST_OSCILLATORS, ST_NOISE,
+ ST_FILTER, ST_VCA, ST_FUSED, ST_MIX) = range(len(STAGES))
+
+
+class StageProfiler:
+    """Aggregates per-stage render times per channel and patch.
+
+    Channels hand in a list of nanosecond counters (one per stage) after
+    every block; totals are kept per (channel, patch name) so presets can be
+    compared. Only active while enabled via AudioEngine.set_profiling().
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._rows: dict[tuple[int, str], dict] = {}
+
+    def reset(self):
+        self._rows.clear()
+
+    def collect(self, channel_id: int, patch_name: str, stage_ns: list[int],
+                elapsed_ns: int, voices: int, n_samples: int):
+        row = self._rows.get((channel_id, patch_name))
+        if row is None:
+            row = {"stages": [0] * len(STAGES), "voice_blocks": 0, "blocks": 0, "samples": 0}
+            self._rows[(channel_id, patch_name)] = row
+        stages = row["stages"]
+        inner = 0
+        for i, ns in enumerate(stage_ns):
+            stages[i] += ns
+            inner += ns
+            stage_ns[i] = 0
+        stages[ST_MIX] += max(elapsed_ns - inner, 0)
+        row["voice_blocks"] += voices
+        row["blocks"] += 1
+        row["samples"] += n_samples
+
+    def report(self) -> dict:
+        """JSON-ready totals per channel/patch and per patch (nanoseconds)."""
+        channels = []
+        patches: dict[str, dict] = {}
+        for (ch, name), row in sorted(self._rows.items()):
+            stages = dict(zip(STAGES, row["stages"]))
+            channels.append({"channel": ch + 1, "patch": name, "blocks": row["blocks"],
+                             "voice_blocks": row["voice_blocks"], "samples": row["samples"],
+                             "stages_ns": stages})
+            agg = patches.setdefault(name, {"blocks": 0, "voice_blocks": 0, "samples": 0,
+                                            "stages_ns": dict.fromkeys(STAGES, 0)})
+            agg["blocks"] += row["blocks"]
+            agg["voice_blocks"] += row["voice_blocks"]
+            agg["samples"] += row["samples"]
+            for k, v in stages.items():
+                agg["stages_ns"][k] += v
+        return {"channels": channels, "patches": patches}
+
+    def save(self, path: str):
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2)
+
+    def table(self) -> str:
+        lines = []
+        for entry in self.report()["channels"]:
+            if entry["voice_blocks"] == 0:
+                continue  # idle channel
+            stages = entry["stages_ns"]
+            total = sum(stages.values()) or 1
+            vb = entry["voice_blocks"]
+            lines.append(f"Channel {entry['channel']} — {entry['patch']}  "
+                         f"({entry['blocks']} blocks, {entry['voice_blocks']} voice-blocks)")
+            lines.append(f"  {'stage':12s} {'total ms':>10s} {'share':>7s} {'us/voice-block':>15s}")
+            for name in STAGES:
+                ns = stages[name]
+                if ns == 0:
+                    continue
+                lines.append(f"  {name:12s} {ns / 1e6:10.2f} {100.0 * ns / total:6.1f}% {ns / 1e3 / vb:15.2f}")
+        return "\n".join(lines) if lines else "No profile data (enable with 'profile on')."
+
+
+def lap(stage_ns: list[int], stage: int, t0: int) -> int:
+    """Charge the time since t0 to `stage`; returns the new start time."""
+    t1 = perf_counter_ns()
+    stage_ns[stage] += t1 - t0
+    return t1
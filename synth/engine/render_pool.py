@@ -0,0 +1,62 @@
+import threading
+import numpy as np
+
+
+class ChannelRenderPool:
+    """Persistent worker threads that render channels concurrently.
+
+    Channel i belongs to worker i % workers. Each block the caller publishes
+    the frame count, releases the workers through a start barrier and waits
+    on a done barrier; every channel renders into its row of the caller's
+    (channels, frames) buffer. The ladder and
+    fused kernels are compiled nogil, so channels rendered in "fused" mode
+    really run on separate cores.
+    """
+
+    def __init__(self, channels: list, workers: int):
+        self.channels = channels
+        self.workers = max(1, min(workers, len(channels)))
+        self._bufs: np.ndarray | None = None
+        self._error: BaseException | None = None
+        self._closing = False
+        self._start = threading.Barrier(self.workers + 1)
+        self._done = threading.Barrier(self.workers + 1)
+        self._threads = [
+            threading.Thread(target=self._worker, args=(i,), daemon=True, name=f"voog-render-{i}")
+            for i in range(self.workers)
+        ]
+        for t in self._threads:
+            t.start()
+
+    def render(self, bufs: np.ndarray) -> np.ndarray:
+        """Render channel i into bufs[i] (shape (channels, frames)); blocks until all are done."""
+        self._bufs = bufs
+        self._start.wait()
+        self._done.wait()
+        if self._error is not None:
+            err, self._error = self._error, None
+            raise err
+        return bufs
+
+    def close(self):
+        if self._closing:
+            return
+        self._closing = True
+        self._start.wait()  # release the workers so they see the flag
+        for t in self._threads:
+            t.join(timeout=1.0)
+
+    def _worker(self, idx: int):
+        mine = range(idx, len(self.channels), self.workers)
+        while True:
+            self._start.wait()
+            if self._closing:
+                return
+            try:
+                bufs = self._bufs
+                frames = bufs.shape[1]
+                for i in mine:
+                    self.channels[i].render(frames, bufs[i])
+            except BaseException as e:
+                self._error = e
+            self._done.wait()
@@ -0,0 +1,67 @@
+import threading
+import numpy as np
+
+
+class LookaheadRenderer:
+    """Renders output blocks ahead of the audio callback on a dedicated thread.
+
+    A preallocated ring holds `depth` blocks. The render thread keeps it
+    full; the audio callback only copies out the oldest ready block and
+    wakes the thread. Playback is delayed by `depth` blocks in exchange for
+    absorbing GC pauses, GUI work and other hiccups up to that long. When no
+    block is ready the callback outputs silence and counts an underflow.
+    """
+
+    def __init__(self, render_block, depth: int, block_size: int):
+        self._render_block = render_block  # callable(frames) -> np.ndarray
+        self.depth = max(1, depth)
+        self.block_size = block_size
+        self._blocks = np.zeros((self.depth, block_size), dtype=np.float32)
+        self._write = 0  # advanced by the render thread only
+        self._read = 0   # advanced by the audio callback only
+        self.underflows = 0
+        self._space = threading.Event()
+        self._running = False
+        self._thread: threading.Thread | None = None
+
+    def start(self):
+        self._running = True
+        while self.ready < self.depth:  # start playback with a full lookahead
+            self._fill_one()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="voog-lookahead")
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        self._space.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    def read_into(self, out: np.ndarray) -> bool:
+        """Audio-callback side: copy the next block into `out`, or silence on underflow."""
+        if self._read >= self._write or len(out) != self.block_size:
+            out.fill(0.0)
+            self.underflows += 1
+            self._space.set()
+            return False
+        out[:] = self._blocks[self._read % self.depth]
+        self._read += 1
+        self._space.set()
+        return True
+
+    @property
+    def ready(self) -> int:
+        return self._write - self._read
+
+    def _fill_one(self):
+        self._blocks[self._write % self.depth] = self._render_block(self.block_size)
+        self._write += 1
+
+    def _run(self):
+        while self._running:
+            self._space.clear()
+            if self.ready < self.depth:
+                self._fill_one()
+            else:
+                self._space.wait(0.1)
@@ -0,0 +1,92 @@
+import numpy as np
+from ..config import SAMPLE_RATE
+
+# Status flag bits stored per callback
+FLAG_OUTPUT_UNDERFLOW = 1
+FLAG_OUTPUT_OVERFLOW = 2
+FLAG_PRIMING_OUTPUT = 4
+
+_HIST_BINS = 200  # 1% load steps up to 200% of the block budget, plus one overflow bin
+
+
+class CallbackStats:
+    """Per-callback render timing and xrun counters with fixed-size storage.
+
+    Each block's render time and load (render time / block duration) go
+    into a ring of the most recent `size` blocks and into a lifetime load
+    histogram; recording is a few scalar array writes, so it stays on in
+    production. Percentiles are computed only when stats are queried.
+    """
+
+    def __init__(self, size: int = 4096):
+        self.size = size
+        self._render_time = np.zeros(size, dtype=np.float64)
+        self._load = np.zeros(size, dtype=np.float64)
+        self._flags = np.zeros(size, dtype=np.uint8)
+        self._hist = np.zeros(_HIST_BINS + 1, dtype=np.int64)
+        self.reset()
+
+    def reset(self):
+        self._hist[:] = 0
+        self.blocks = 0
+        self.callbacks = 0
+        self.max_load = 0.0
+        self.deadline_misses = 0
+        self.output_underflows = 0
+        self.output_overflows = 0
+
+    def record(self, elapsed: float, frames: int) -> float:
+        """Render time of one block (any thread that renders blocks); returns its load."""
+        load = elapsed * SAMPLE_RATE / frames
+        i = self.blocks % self.size
+        self._render_time[i] = elapsed
+        self._load[i] = load
+        self._hist[min(int(load * 100.0), _HIST_BINS)] += 1
+        if load > self.max_load:
+            self.max_load = load
+        if load > 1.0:
+            self.deadline_misses += 1
+        self.blocks += 1
+        return load
+
+    def record_status(self, status):
+        """sounddevice CallbackFlags of one callback."""
+        flags = 0
+        if status:
+            if status.output_underflow:
+                flags |= FLAG_OUTPUT_UNDERFLOW
+                self.output_underflows += 1
+            if status.output_overflow:
+                flags |= FLAG_OUTPUT_OVERFLOW
+                self.output_overflows += 1
+            if status.priming_output:
+                flags |= FLAG_PRIMING_OUTPUT
+        self._flags[self.callbacks % self.size] = flags
+        self.callbacks += 1
+
+    def _load_percentile(self, q: float) -> float:
+        total = self._hist.sum()
+        if total == 0:
+            return 0.0
+        idx = int(np.searchsorted(np.cumsum(self._hist), q * total))
+        if idx >= _HIST_BINS:
+            return self.max_load
+        return min((idx + 1) / 100.0, self.max_load)
+
+    def summary(self) -> dict:
+        recent = min(self.blocks, self.size)
+        render_ms = self._render_time[:recent] * 1000.0
+        return {
+            "blocks": self.blocks,
+            "callbacks": self.callbacks,
+            "load_p50": self._load_percentile(0.50),
+            "load_p99": self._load_percentile(0.99),
+            "load_max": self.max_load,
+            "render_ms_p50": float(np.percentile(render_ms, 50)) if recent else 0.0,
+            "render_ms_p99": float(np.percentile(render_ms, 99)) if recent else 0.0,
+            "render_ms_max": float(render_ms.max()) if recent else 0.0,
+            "deadline_misses": self.deadline_misses,
+            "output_underflows": self.output_underflows,
+            "output_overflows": self.output_overflows,
+            "xruns": self.output_underflows + self.output_overflows,
+        }
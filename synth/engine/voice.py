@@ -6,68 +6,75 @@ from ..dsp.filter import MoogFilter
 from ..dsp.noise import NoiseGenerator
 from ..dsp.lfo import LFO
 from ..dsp.glide import Glide
-from ..patch.patch import Patch
+from ..dsp.buffers import Scratch
+from ..dsp.exp2 import semitone_ratio, semitones_to_ratio
+from ..patch.patch import OscParams, Patch
+from .culling import fade_out
+from .profiler import (
+    lap, perf_counter_ns, ST_AMP_ENV, ST_FILTER_ENV, ST_LFO, ST_GLIDE, ST_OSCILLATORS, ST_NOISE,
+    ST_FILTER, ST_VCA,
+)
 
 
 def midi_to_freq(note: int) -> float:
-    return A4_FREQ * (2.0 ** ((note - 69) / 12.0))
+    return A4_FREQ * semitone_ratio(note - 69)
+
+
+def _exp2_offset(mod: np.ndarray, semitones: float, base: float, out: np.ndarray) -> np.ndarray:
+    """base * (2 ** (mod * semitones / 12) - 1): a cutoff offset in Hz, computed in place."""
+    semitones_to_ratio(mod, semitones, out)
+    out -= 1.0
+    out *= base
+    return out
 
 
 class Voice:
-    def __init__(self):
-        self.oscillators = [Oscillator() for _ in range(NUM_OSCILLATORS)]
-        self.noise = NoiseGenerator()
-        self.moog_filter = MoogFilter()
-        self.amp_env = ADSR()
-        self.filter_env = ADSR()
-        self.lfo = LFO()
-        self.glide = Glide()
+    def __init__(self, dtype=np.float64, rng: np.random.Generator | None = None):
+        # dtype of all audio buffers: float64, or float32 for the single-precision mode
+        self.dtype = np.dtype(dtype)
+        self.oscillators = [Oscillator(dtype) for _ in range(NUM_OSCILLATORS)]
+        self.noise = NoiseGenerator(dtype, rng)
+        self.moog_filter = MoogFilter(dtype)
+        self.amp_env = ADSR(dtype=dtype)
+        self.filter_env = ADSR(dtype=dtype)
+        self.lfo = LFO(dtype)
+        self.glide = Glide()  # frequencies stay float64: rounding them would drift the phase
 
         self.note: int = -1
         self.velocity: float = 0.0
         self.active: bool = False
+        self.fade: int = 0  # samples left of a cull fade-out (0: not being culled)
         self._base_freq: float = 0.0
 
-        # Pre-allocated buffers
-        self._mix_buf: np.ndarray | None = None
+        # Pre-allocated buffers: amp env, filter env, LFO, mix, one oscillator,
+        # cutoff modulation, modulation temp; glide and pitch-modulated frequency
+        self._buf = Scratch(7, dtype)
+        self._freq_buf = Scratch(2)
+
+        # Per-stage nanosecond counters, set by the channel while profiling
+        self.stage_ns: list[int] | None = None
 
-    def apply_patch(self, patch: Patch):
+    def bind_patch(self, patch: Patch):
+        """Point every component at the patch's parameter blocks (no copies).
+
+        Later changes to the patch reach the voice without another call.
+        Oscillators beyond the patch's own are bound to silent blocks.
+        """
         for i, osc in enumerate(self.oscillators):
-            if i < len(patch.oscillators):
-                op = patch.oscillators[i]
-                osc.waveform = op.waveform
-                osc.octave = op.octave
-                osc.semitone = op.semitone
-                osc.detune = op.detune
-                osc.level = op.level
-                osc.pulse_width = op.pulse_width
-        self.noise.noise_type = patch.noise.noise_type
-        self.noise.level = patch.noise.level
-        self.moog_filter.cutoff = patch.filter.cutoff
-        self.moog_filter.resonance = patch.filter.resonance
-        self.moog_filter.env_amount = patch.filter.env_amount
-        self.moog_filter.key_tracking = patch.filter.key_tracking
-        self.amp_env.attack = patch.amp_adsr.attack
-        self.amp_env.decay = patch.amp_adsr.decay
-        self.amp_env.sustain = patch.amp_adsr.sustain
-        self.amp_env.release = patch.amp_adsr.release
-        self.filter_env.attack = patch.filter_adsr.attack
-        self.filter_env.decay = patch.filter_adsr.decay
-        self.filter_env.sustain = patch.filter_adsr.sustain
-        self.filter_env.release = patch.filter_adsr.release
-        self.lfo.waveform = patch.lfo.waveform
-        self.lfo.rate = patch.lfo.rate
-        self.lfo.depth = patch.lfo.depth
-        self.lfo.destination = patch.lfo.destination
-        self.lfo.key_sync = patch.lfo.key_sync
-        self.glide.time = patch.glide.time
-        self.glide.mode = patch.glide.mode
+            osc.params = patch.oscillators[i] if i < len(patch.oscillators) else OscParams(level=0.0)
+        self.noise.params = patch.noise
+        self.moog_filter.params = patch.filter
+        self.amp_env.params = patch.amp_adsr
+        self.filter_env.params = patch.filter_adsr
+        self.lfo.params = patch.lfo
+        self.glide.params = patch.glide
 
     def note_on(self, note: int, velocity: int, legato: bool = False):
         self.note = note
         self.velocity = velocity / 127.0
         self._base_freq = midi_to_freq(note)
         self.active = True
+        self.fade = 0
         self.glide.set_target(self._base_freq, legato=legato)
         self.amp_env.gate_on()
         self.filter_env.gate_on()
@@ -81,41 +88,82 @@ class Voice:
         self.amp_env.gate_off()
         self.filter_env.gate_off()
 
-    def render(self, n_samples: int) -> np.ndarray:
+    def cull(self, fade: int):
+        """Fade out over `fade` samples, then stop (CPU budget culling)."""
+        if not self.fade:
+            self.fade = fade
+
+    def render(self, n_samples: int, out: np.ndarray | None = None,
+               lfo: np.ndarray | None = None, noise: np.ndarray | None = None) -> np.ndarray:
+        """Render one block; writes into `out` when given, allocating nothing.
+
+        `lfo` is the channel's shared LFO signal when key sync is off, and
+        `noise` its shared noise signal when the patch shares noise; the
+        voice's own LFO or noise generator is then left alone.
+        """
+        if out is None:
+            out = np.empty(n_samples, dtype=self.dtype)
         if not self.active:
-            return np.zeros(n_samples, dtype=np.float64)
+            out.fill(0.0)
+            return out
+        prof = self.stage_ns
+        if prof is not None:
+            t = perf_counter_ns()
+        amp_env, filt_env, lfo_out, mix, osc_buf, cutoff_mod, tmp = self._buf(n_samples)
+        freq_buf, pitch_buf = self._freq_buf(n_samples)
 
         # Amp envelope
-        amp_env = self.amp_env.render(n_samples)
-        if not self.amp_env.is_active() and np.max(amp_env) < 1e-5:
+        self.amp_env.render(n_samples, amp_env)
+        if not self.amp_env.is_active() and amp_env.max() < 1e-5:
             self.active = False
-            return np.zeros(n_samples, dtype=np.float64)
+            out.fill(0.0)
+            return out
+        if prof is not None:
+            t = lap(prof, ST_AMP_ENV, t)
 
         # Filter envelope
-        filt_env = self.filter_env.render(n_samples)
+        self.filter_env.render(n_samples, filt_env)
+        if prof is not None:
+            t = lap(prof, ST_FILTER_ENV, t)
 
         # LFO
-        lfo_out = self.lfo.render(n_samples)
+        if lfo is None:
+            lfo_out = self.lfo.render(n_samples, lfo_out)
+        else:
+            lfo_out = lfo
 
-        # Pitch modulation from LFO
-        pitch_mod = None
+        # Pitch modulation from LFO: one frequency ratio per sample for all oscillators
+        pitch_ratio = None
         if self.lfo.destination == "pitch" and self.lfo.depth > 0:
-            pitch_mod = lfo_out * 12.0  # LFO depth scales to semitones
-
-        # Glide
-        freq_buf = self.glide.render(n_samples)
+            pitch_ratio = semitones_to_ratio(lfo_out, 12.0, pitch_buf)  # LFO depth scales to semitones
+        if prof is not None:
+            t = lap(prof, ST_LFO, t)
+
+        # Glide: oscillators follow it sample by sample while it moves
+        gliding = self.glide.gliding
+        freq = self.glide.render(n_samples, freq_buf)
+        if pitch_ratio is not None:
+            freq = np.multiply(pitch_ratio, freq, out=pitch_ratio)
+        elif not gliding:
+            freq = float(freq[0])  # constant: the oscillators' scalar path
+        if prof is not None:
+            t = lap(prof, ST_GLIDE, t)
 
         # Mix oscillators
-        mix = np.zeros(n_samples, dtype=np.float64)
+        mix.fill(0.0)
         for osc in self.oscillators:
             if osc.level > 0.0:
-                # Use mean frequency for the buffer (glide is slow-moving)
-                mean_freq = float(np.mean(freq_buf))
-                mix += osc.render(mean_freq, n_samples, pitch_mod)
+                mix += osc.render(freq, n_samples, out=osc_buf)
+        if prof is not None:
+            t = lap(prof, ST_OSCILLATORS, t)
 
         # Add noise
-        if self.noise.level > 0.0:
-            mix += self.noise.render(n_samples)
+        if noise is not None:
+            mix += noise
+        elif self.noise.level > 0.0:
+            mix += self.noise.render(n_samples, osc_buf)
+            if prof is not None:
+                t = lap(prof, ST_NOISE, t)
 
         # Filter modulation
         # env_amount in semitones → convert to Hz offset
@@ -125,30 +173,48 @@ class Voice:
             kt_offset = (self._base_freq - A4_FREQ) * self.moog_filter.key_tracking
             base_cutoff += kt_offset
 
-        cutoff_mod = np.zeros(n_samples, dtype=np.float64)
+        modulated = False
         if self.moog_filter.env_amount != 0.0:
             # Convert envelope (0..1) to frequency offset
-            env_freq = base_cutoff * (2.0 ** (filt_env * self.moog_filter.env_amount / 12.0) - 1.0)
-            cutoff_mod += env_freq
+            _exp2_offset(filt_env, self.moog_filter.env_amount, base_cutoff, cutoff_mod)
+            modulated = True
         if self.lfo.destination == "filter" and self.lfo.depth > 0:
-            lfo_freq = base_cutoff * (2.0 ** (lfo_out * 2.0 / 12.0) - 1.0)
-            cutoff_mod += lfo_freq
+            if modulated:
+                cutoff_mod += _exp2_offset(lfo_out, 2.0, base_cutoff, tmp)
+            else:
+                _exp2_offset(lfo_out, 2.0, base_cutoff, cutoff_mod)
+                modulated = True
 
         # Apply filter
-        filtered = self.moog_filter.render(mix, cutoff_mod if np.any(cutoff_mod) else None)
+        # (count_nonzero rather than any(): any() casts to bool through a temporary)
+        if modulated and not np.count_nonzero(cutoff_mod):
+            modulated = False
+        filtered = self.moog_filter.render(mix, cutoff_mod if modulated else None, mix)
+        if prof is not None:
+            t = lap(prof, ST_FILTER, t)
 
         # Amp modulation from LFO
         if self.lfo.destination == "amp" and self.lfo.depth > 0:
-            amp_lfo = 1.0 + lfo_out * 0.5  # Tremolo
-            filtered *= amp_lfo
+            np.multiply(lfo_out, 0.5, out=tmp)  # Tremolo
+            tmp += 1.0
+            filtered *= tmp
 
         # Apply amp envelope and velocity
-        return filtered * amp_env * self.velocity
+        np.multiply(filtered, amp_env, out=out)
+        out *= self.velocity
+        if self.fade:
+            self.fade = fade_out(out, self.fade)
+            if not self.fade:
+                self.active = False
+        if prof is not None:
+            lap(prof, ST_VCA, t)
+        return out
 
     def reset(self):
         self.note = -1
         self.velocity = 0.0
         self.active = False
+        self.fade = 0
         self.amp_env.reset()
         self.filter_env.reset()
         self.lfo.reset()
@@ -1,63 +1,105 @@
+from bisect import insort
+from collections import OrderedDict
+from heapq import heappop, heappush
+import numpy as np
 from ..config import MAX_VOICES
+from ..dsp.envelope import IDLE, RELEASE
 from .voice import Voice
 
 
 class VoiceAllocator:
-    """Polyphonic voice allocator with voice stealing (oldest-note strategy)."""
+    """Polyphonic voice allocator with voice stealing (oldest-note strategy).
 
-    def __init__(self, max_voices: int = MAX_VOICES):
+    Every operation is O(1) or O(log n) in the number of voices: a note →
+    voice map finds a retriggered note, a heap of free voice indices hands out
+    the lowest free voice, and an age-ordered dict yields the oldest voice to
+    steal. `active` lists the sounding voices in index order; it is kept up to
+    date as notes start and by release_finished() after every render.
+    """
+
+    def __init__(self, max_voices: int = MAX_VOICES, dtype=np.float64,
+                 rng: np.random.Generator | None = None):
         self.max_voices = max_voices
-        self.voices = [Voice() for _ in range(max_voices)]
-        self._age_counter = 0
-        self._voice_ages: list[int] = [0] * max_voices
-        self._held_notes: list[int] = []  # for legato detection
+        self.voices = [Voice(dtype, rng) for _ in range(max_voices)]
+        # Indices of the sounding voices, ascending (the render order). Updated
+        # in place: the voice bank holds a reference to this list
+        self.active: list[int] = []
+        self._free = list(range(max_voices))  # heap: lowest index first
+        self._note_voice: dict[int, int] = {}  # note → its sounding voice
+        # Every voice, least recently triggered first (never-used ones in index order)
+        self._by_age: OrderedDict[int, None] = OrderedDict.fromkeys(range(max_voices))
+        self._held: dict[int, int] = {}  # held note → key presses not yet released
+        self._n_held = 0  # for legato detection
+
+    def _trigger(self, i: int, note: int, velocity: int, legato: bool) -> Voice:
+        v = self.voices[i]
+        v.note_on(note, velocity, legato=legato)
+        self._note_voice[note] = i
+        self._by_age.move_to_end(i)
+        return v
 
     def note_on(self, note: int, velocity: int) -> Voice:
-        legato = len(self._held_notes) > 0
-        self._held_notes.append(note)
+        legato = self._n_held > 0
+        self._held[note] = self._held.get(note, 0) + 1
+        self._n_held += 1
 
         # 1. Re-use voice already playing this note
-        for i, v in enumerate(self.voices):
-            if v.note == note and v.active:
-                v.note_on(note, velocity, legato=legato)
-                self._age_counter += 1
-                self._voice_ages[i] = self._age_counter
-                return v
+        i = self._note_voice.get(note)
+        if i is not None:
+            return self._trigger(i, note, velocity, legato)
 
         # 2. Find a free voice
-        for i, v in enumerate(self.voices):
-            if not v.active:
-                v.note_on(note, velocity, legato=legato)
-                self._age_counter += 1
-                self._voice_ages[i] = self._age_counter
-                return v
+        if self._free:
+            i = heappop(self._free)
+            insort(self.active, i)
+            return self._trigger(i, note, velocity, legato)
 
         # 3. Voice stealing – steal the oldest active voice
-        oldest_idx = 0
-        oldest_age = self._voice_ages[0]
-        for i in range(1, self.max_voices):
-            if self._voice_ages[i] < oldest_age:
-                oldest_age = self._voice_ages[i]
-                oldest_idx = i
-        v = self.voices[oldest_idx]
+        i = next(iter(self._by_age))
+        v = self.voices[i]
+        del self._note_voice[v.note]
         v.reset()
-        v.note_on(note, velocity, legato=legato)
-        self._age_counter += 1
-        self._voice_ages[oldest_idx] = self._age_counter
-        return v
+        return self._trigger(i, note, velocity, legato)
 
     def note_off(self, note: int):
-        if note in self._held_notes:
-            self._held_notes.remove(note)
-        for v in self.voices:
-            if v.note == note and v.active:
-                v.note_off()
+        count = self._held.get(note, 0)
+        if count:
+            self._n_held -= 1
+            if count == 1:
+                del self._held[note]
+            else:
+                self._held[note] = count - 1
+        i = self._note_voice.get(note)
+        if i is not None:
+            self.voices[i].note_off()
+
+    def is_held(self, note: int) -> bool:
+        """Whether a note_off for `note` would release a voice (not already releasing)."""
+        i = self._note_voice.get(note)
+        return i is not None and self.voices[i].amp_env._state not in (IDLE, RELEASE)
 
     def all_notes_off(self):
-        self._held_notes.clear()
-        for v in self.voices:
-            if v.active:
-                v.note_off()
+        self._held.clear()
+        self._n_held = 0
+        for i in self.active:
+            self.voices[i].note_off()
+
+    def release_finished(self):
+        """Return voices that fell silent during the last render to the free pool."""
+        active = self.active
+        voices = self.voices
+        for i in active:
+            if not voices[i].active:
+                break
+        else:
+            return
+        finished = [i for i in active if not voices[i].active]
+        for i in finished:
+            active.remove(i)
+            heappush(self._free, i)
+            note = voices[i].note
+            if self._note_voice.get(note) == i:
+                del self._note_voice[note]
 
     def active_voice_count(self) -> int:
-        return sum(1 for v in self.voices if v.active)
+        return len(self.active)
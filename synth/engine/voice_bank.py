@@ -0,0 +1,423 @@
+import numpy as np
+from ..config import (
+    SAMPLE_RATE, BUFFER_SIZE, CONTROL_RATE_DIVIDER, WAVETABLE_SIZE, NUM_OSCILLATORS, A4_FREQ,
+)
+from ..dsp.envelope import _MIN_TIME, IDLE, ATTACK, DECAY, SUSTAIN, RELEASE
+from ..dsp.filter import GAIN_TABLE, MATRIX_SIZE, _moog_ladder_process_bank
+from ..dsp.glide import glide_steps
+from ..dsp.lfo import lfo_phases, lfo_shape
+from ..dsp.oscillator import _TABLES, MIP_EDGES, TABLE_STACK, osc_ratio
+from ..dsp.exp2 import semitones_to_ratio
+from ..dsp import fused
+from ..dsp.fused import N_PARAMS
+from ..dsp.buffers import Scratch
+from ..dsp.noise import make_rng, uniform_noise
+from ..patch.patch import Patch, OscParams, ADSRParams, LFOParams
+from .culling import CULL_FADE, fade_out
+from .profiler import (
+    lap, perf_counter_ns, ST_AMP_ENV, ST_FILTER_ENV, ST_LFO, ST_GLIDE, ST_OSCILLATORS, ST_NOISE,
+    ST_FILTER, ST_VCA, ST_FUSED,
+)
+
+
+def _control_layout(n_samples: int) -> tuple[int, int, int]:
+    n_blocks = n_samples // CONTROL_RATE_DIVIDER
+    remainder = n_samples % CONTROL_RATE_DIVIDER
+    return n_blocks, remainder, n_blocks + (1 if remainder else 0)
+
+
+def _interpolate_bank(ctrl: np.ndarray, n_samples: int) -> np.ndarray:
+    """Control-rate (voices, blocks) → audio-rate (voices, samples).
+
+    Same shape as the per-voice envelope/LFO interpolation: the first block
+    holds its value, every later block ramps linearly from the previous one.
+    """
+    n_voices = ctrl.shape[0]
+    n_blocks, remainder, total = _control_layout(n_samples)
+    if total <= 1:
+        return np.repeat(ctrl[:, -1:], n_samples, axis=1)
+
+    out = np.empty((n_voices, n_samples), dtype=np.float64)
+    d = CONTROL_RATE_DIVIDER
+    if n_blocks:
+        full = out[:, :n_blocks * d].reshape(n_voices, n_blocks, d)
+        prev = np.empty((n_voices, n_blocks), dtype=np.float64)
+        prev[:, 0] = ctrl[:, 0]
+        prev[:, 1:] = ctrl[:, :n_blocks - 1]
+        t = np.arange(d, dtype=np.float64) / d
+        full[:] = prev[:, :, None] + (ctrl[:, :n_blocks] - prev)[:, :, None] * t
+    if remainder:
+        prev = ctrl[:, -2]
+        t = np.arange(remainder, dtype=np.float64) / remainder
+        out[:, n_blocks * d:] = prev[:, None] + (ctrl[:, -1] - prev)[:, None] * t
+    return out
+
+
+def _render_env_bank(state: np.ndarray, level: np.ndarray, params: ADSRParams,
+                     n_samples: int) -> np.ndarray:
+    """Vectorized ADSR.render over voices; updates state/level in place."""
+    n_blocks, remainder, total = _control_layout(n_samples)
+    ctrl = np.empty((len(level), total), dtype=np.float64)
+    attack_rate = max(params.attack, _MIN_TIME) * SAMPLE_RATE
+    decay_rate = max(params.decay, _MIN_TIME) * SAMPLE_RATE
+    release_rate = max(params.release, _MIN_TIME) * SAMPLE_RATE
+    sustain = params.sustain
+
+    for i in range(total):
+        n = CONTROL_RATE_DIVIDER if i < n_blocks else remainder
+        att = state == ATTACK
+        dec = state == DECAY
+        sus = state == SUSTAIN
+        rel = state == RELEASE
+
+        if att.any():
+            level[att] += n / attack_rate
+            done = att & (level >= 1.0)
+            level[done] = 1.0
+            state[done] = DECAY
+        if dec.any():
+            level[dec] -= (1.0 - sustain) * n / decay_rate
+            done = dec & (level <= sustain)
+            level[done] = sustain
+            state[done] = SUSTAIN
+        if sus.any():
+            level[sus] = sustain
+        if rel.any():
+            level[rel] *= 1.0 - n / release_rate
+            done = rel & (level < 1e-5)
+            level[done] = 0.0
+            state[done] = IDLE
+        ctrl[:, i] = level
+
+    return _interpolate_bank(ctrl, n_samples)
+
+
+def _render_lfo_bank(phase: np.ndarray, params: LFOParams, n_samples: int) -> np.ndarray:
+    """Vectorized LFO.render over voices; updates phase in place."""
+    if params.depth <= 0.0:
+        return np.zeros((len(phase), n_samples), dtype=np.float64)
+    _, _, total = _control_layout(n_samples)
+    ctrl = np.empty((len(phase), total), dtype=np.float64)
+    phase_inc = params.rate * CONTROL_RATE_DIVIDER / SAMPLE_RATE
+    for i in range(len(phase)):
+        phase[i] = lfo_phases(float(phase[i]), phase_inc, ctrl[i])
+    lfo_shape(params.waveform, ctrl)
+    return _interpolate_bank(ctrl, n_samples) * params.depth
+
+
+def _render_glide_bank(current: np.ndarray, target: np.ndarray, glide_time: float,
+                       n_samples: int) -> np.ndarray:
+    """Closed-form equivalent of Glide.render's per-sample recursion, per voice."""
+    if glide_time <= 0.0:
+        current[:] = target
+        return np.repeat(target[:, None], n_samples, axis=1)
+    coeff = 1.0 - np.exp(-1.0 / (glide_time * SAMPLE_RATE))
+    decay = (1.0 - coeff) ** glide_steps(n_samples)
+    out = target[:, None] + (current - target)[:, None] * decay
+    current[:] = out[:, -1]
+    settled = np.abs(current - target) < 0.01
+    current[settled] = target[settled]
+    return out
+
+
+def _render_osc_bank(phase: np.ndarray, freq: np.ndarray, osc: OscParams, n_samples: int) -> np.ndarray:
+    """Vectorized Oscillator.render for one oscillator slot across voices.
+
+    `freq` holds each voice's per-sample frequency (voices × samples).
+    """
+    ratio = osc_ratio(osc.octave, osc.semitone, osc.detune)
+    tables = _TABLES.get(osc.waveform, _TABLES["saw"])
+    ts = WAVETABLE_SIZE
+
+    increments = freq * ratio
+    peak = increments.max(axis=1)
+    increments /= SAMPLE_RATE
+    # One mip level per voice, chosen like Oscillator.render
+    table = tables[np.searchsorted(MIP_EDGES, peak, side="right")]
+
+    cumulative = np.cumsum(increments, axis=1)
+    phases = (phase[:, None] + cumulative - increments) % 1.0
+    phase[:] = (phase + cumulative[:, -1]) % 1.0
+
+    idx_f = phases * ts
+    idx_i = idx_f.astype(np.int32)
+    frac = idx_f - idx_i
+    idx_next = (idx_i + 1) % ts
+    idx_i = idx_i % ts
+    rows = np.arange(len(freq))[:, None]
+    out = table[rows, idx_i] * (1.0 - frac) + table[rows, idx_next] * frac
+    return out * osc.level
+
+
+def fused_available() -> bool:
+    return fused.HAS_NUMBA
+
+
+def _store_env(env, state: int, level: float):
+    if state != env._state:
+        env._state = int(state)
+        env._samples_in_state = 0
+    env._level = float(level)
+
+
+class VoiceBank:
+    """Struct-of-arrays renderer for all voices of a channel.
+
+    Voice objects stay authoritative for note events (the allocator keeps
+    driving them); on each block their state is gathered into per-voice
+    arrays, the whole channel is rendered with batched (voices × samples)
+    NumPy operations, and the state is written back. Output matches the
+    per-voice Voice.render path.
+
+    With fused=True (and numba installed) the batched NumPy stages are
+    replaced by one compiled kernel that runs the whole signal chain per
+    voice in a single sample loop.
+    """
+
+    def __init__(self, voices: list, fused: bool = False, rng: np.random.Generator | None = None,
+                 active: list[int] | None = None):
+        self.voices = voices
+        # Indices of the sounding voices, maintained by the allocator (None: scan them all)
+        self.active = active
+        self.fused = fused and fused_available()
+        # The voices' noise stream: the fused kernel draws their white noise from it in one call
+        self.rng = rng if rng is not None else make_rng()
+        self._white = Scratch(1, size=len(voices) * BUFFER_SIZE)
+        self._kernel_work = Scratch(8, size=max(BUFFER_SIZE, NUM_OSCILLATORS))
+        self._ladder_matrix = np.zeros(MATRIX_SIZE, dtype=np.float64)
+        # Kernel inputs, refilled in place every block; the state arrays hold
+        # all of the channel's voices and the kernel reads the first n
+        n = len(voices)
+        self._params = np.zeros(N_PARAMS, dtype=np.float64)
+        self._osc = (np.zeros(NUM_OSCILLATORS, dtype=np.int64), np.ones(NUM_OSCILLATORS, dtype=np.float64),
+                     np.zeros(NUM_OSCILLATORS, dtype=np.float64))
+        self._state = (
+            np.zeros(n, dtype=np.int8), np.zeros(n, dtype=np.float64),        # amp env state, level
+            np.zeros(n, dtype=np.int8), np.zeros(n, dtype=np.float64),        # filter env state, level
+            np.zeros(n, dtype=np.float64),                                    # LFO phase
+            np.zeros(n, dtype=np.float64), np.zeros(n, dtype=np.float64),     # glide current, target
+            np.zeros((n, NUM_OSCILLATORS), dtype=np.float64),                 # oscillator phases
+            np.zeros((n, 7), dtype=np.float64),                               # pink noise filter
+            np.zeros((n, 4), dtype=np.float64),                               # ladder
+            np.zeros(n, dtype=np.float64),                                    # velocity
+            np.zeros(n, dtype=np.int64),                                      # cull fade left
+            np.zeros(n, dtype=np.float64),                                    # base frequency
+            np.ones(n, dtype=np.bool_), np.zeros(n, dtype=np.float64),        # live, block peak (out)
+        )
+        self._no_white = np.zeros((n, 0), dtype=np.float64)
+
+    def render(self, patch: Patch, n_samples: int, stage_ns: list[int] | None = None,
+               out: np.ndarray | None = None, lfo: np.ndarray | None = None,
+               lfo_phase: float = 0.0, noise: np.ndarray | None = None,
+               silence: float = 0.0) -> np.ndarray:
+        """Render the channel's active voices (into `out` when given).
+
+        `stage_ns` collects per-stage timings while profiling. `lfo` is the
+        channel's free-running LFO signal (key sync off), shared by all
+        voices instead of their own LFOs; `lfo_phase` is its phase at the
+        start of the block. `noise` is the channel's shared noise signal,
+        added to every voice instead of their own noise. A releasing voice
+        whose output peak in the block is below `silence` is retired.
+        """
+        if out is None:
+            out = np.empty(n_samples, dtype=np.float64)
+        if self.active is not None:
+            voices = [self.voices[i] for i in self.active]
+        else:
+            voices = [v for v in self.voices if v.active]
+        if not voices:
+            out.fill(0.0)
+            return out
+        prof = stage_ns
+        if prof is not None:
+            t = perf_counter_ns()
+        if self.fused:
+            self._render_fused(voices, patch, n_samples, out, None if lfo is None else lfo_phase, noise,
+                               silence)
+            if prof is not None:
+                lap(prof, ST_FUSED, t)
+            return out
+
+        # Amp envelope — decides which voices are still sounding
+        amp_state = np.array([v.amp_env._state for v in voices], dtype=np.int8)
+        amp_level = np.array([v.amp_env._level for v in voices], dtype=np.float64)
+        amp_env = _render_env_bank(amp_state, amp_level, patch.amp_adsr, n_samples)
+        for i, v in enumerate(voices):
+            _store_env(v.amp_env, amp_state[i], amp_level[i])
+
+        live = ~((amp_state == IDLE) & (amp_env.max(axis=1) < 1e-5))
+        for i in np.flatnonzero(~live):
+            voices[i].active = False
+        if not live.any():
+            out.fill(0.0)
+            return out
+        if not live.all():
+            voices = [v for v, keep in zip(voices, live) if keep]
+            amp_env = amp_env[live]
+        if prof is not None:
+            t = lap(prof, ST_AMP_ENV, t)
+
+        n_voices = len(voices)
+        velocity = np.array([v.velocity for v in voices], dtype=np.float64)
+        base_freq = np.array([v._base_freq for v in voices], dtype=np.float64)
+
+        # Filter envelope
+        filt_state = np.array([v.filter_env._state for v in voices], dtype=np.int8)
+        filt_level = np.array([v.filter_env._level for v in voices], dtype=np.float64)
+        filt_env = _render_env_bank(filt_state, filt_level, patch.filter_adsr, n_samples)
+        if prof is not None:
+            t = lap(prof, ST_FILTER_ENV, t)
+
+        # LFO
+        lfo_p = patch.lfo
+        if lfo is not None:
+            lfo_out = lfo[None, :]
+        else:
+            lfo_phase = np.array([v.lfo._phase for v in voices], dtype=np.float64)
+            lfo_out = _render_lfo_bank(lfo_phase, lfo_p, n_samples)
+        pitch_ratio = None
+        if lfo_p.destination == "pitch" and lfo_p.depth > 0:
+            pitch_ratio = semitones_to_ratio(lfo_out, 12.0, np.empty(lfo_out.shape))
+        if prof is not None:
+            t = lap(prof, ST_LFO, t)
+
+        # Glide
+        glide_cur = np.array([v.glide._current_freq for v in voices], dtype=np.float64)
+        glide_tgt = np.array([v.glide._target_freq for v in voices], dtype=np.float64)
+        freq_buf = _render_glide_bank(glide_cur, glide_tgt, patch.glide.time, n_samples)
+        if pitch_ratio is not None:
+            freq_buf = pitch_ratio * freq_buf
+        if prof is not None:
+            t = lap(prof, ST_GLIDE, t)
+
+        # Oscillators
+        mix = np.zeros((n_voices, n_samples), dtype=np.float64)
+        osc_phase = np.array([[o.phase for o in v.oscillators] for v in voices], dtype=np.float64)
+        for j, osc in enumerate(patch.oscillators[:NUM_OSCILLATORS]):
+            if osc.level > 0.0:
+                phase = osc_phase[:, j].copy()
+                mix += _render_osc_bank(phase, freq_buf, osc, n_samples)
+                osc_phase[:, j] = phase
+        if prof is not None:
+            t = lap(prof, ST_OSCILLATORS, t)
+
+        # Noise keeps its per-voice generator (draw order matches the per-voice path)
+        if noise is not None:
+            mix += noise
+        elif patch.noise.level > 0.0:
+            for i, v in enumerate(voices):
+                mix[i] += v.noise.render(n_samples)
+            if prof is not None:
+                t = lap(prof, ST_NOISE, t)
+
+        # Filter modulation
+        fp = patch.filter
+        base_cutoff = np.full(n_voices, fp.cutoff, dtype=np.float64)
+        if fp.key_tracking > 0:
+            base_cutoff += (base_freq - A4_FREQ) * fp.key_tracking
+        cutoff_mod = np.zeros((n_voices, n_samples), dtype=np.float64)
+        if fp.env_amount != 0.0:
+            cutoff_mod += base_cutoff[:, None] * (semitones_to_ratio(filt_env, fp.env_amount) - 1.0)
+        if lfo_p.destination == "filter" and lfo_p.depth > 0:
+            cutoff_mod += base_cutoff[:, None] * (semitones_to_ratio(lfo_out, 2.0) - 1.0)
+
+        cutoff_buf = np.clip(fp.cutoff + cutoff_mod, 20.0, SAMPLE_RATE * 0.49)
+        unmodulated = ~cutoff_mod.any(axis=1)
+        cutoff_buf[unmodulated] = min(fp.cutoff, SAMPLE_RATE * 0.49)
+
+        filt_states = np.array([v.moog_filter._state for v in voices], dtype=np.float64)
+        filtered = _moog_ladder_process_bank(mix, cutoff_buf, fp.resonance, filt_states,
+                                             float(SAMPLE_RATE), GAIN_TABLE)
+        if prof is not None:
+            t = lap(prof, ST_FILTER, t)
+
+        if lfo_p.destination == "amp" and lfo_p.depth > 0:
+            filtered *= 1.0 + lfo_out * 0.5
+
+        voiced = filtered * amp_env * velocity[:, None]
+        for i, v in enumerate(voices):
+            if v.fade:
+                v.fade = fade_out(voiced[i], v.fade)
+                if not v.fade:
+                    v.active = False
+        np.sum(voiced, axis=0, out=out)
+        peak = np.abs(voiced).max(axis=1)
+        for i, v in enumerate(voices):
+            if v.amp_env._state == RELEASE and peak[i] < silence:
+                v.active = False
+
+        # Write state back to the voices
+        for i, v in enumerate(voices):
+            _store_env(v.filter_env, filt_state[i], filt_level[i])
+            if lfo_p.depth > 0.0 and lfo is None:
+                v.lfo._phase = float(lfo_phase[i])
+            v.glide._current_freq = float(glide_cur[i])
+            for j, osc in enumerate(v.oscillators):
+                osc.phase = float(osc_phase[i, j])
+            v.moog_filter._state[:] = filt_states[i]
+        if prof is not None:
+            lap(prof, ST_VCA, t)
+        return out
+
+    def _render_fused(self, voices: list, patch: Patch, n_samples: int, out: np.ndarray,
+                      shared_lfo_phase: float | None = None,
+                      noise: np.ndarray | None = None, silence: float = 0.0) -> np.ndarray:
+        n_voices = len(voices)
+        (amp_state, amp_level, filt_state, filt_level, lfo_phase, glide_cur, glide_tgt,
+         osc_phase, pink, ladder, velocity, fade, base_freq, live, peak) = self._state
+        for i, v in enumerate(voices):
+            amp_state[i] = v.amp_env._state
+            amp_level[i] = v.amp_env._level
+            filt_state[i] = v.filter_env._state
+            filt_level[i] = v.filter_env._level
+            # Without key sync every voice runs the channel's LFO from the same phase
+            lfo_phase[i] = v.lfo._phase if shared_lfo_phase is None else shared_lfo_phase
+            glide_cur[i] = v.glide._current_freq
+            glide_tgt[i] = v.glide._target_freq
+            for j, o in enumerate(v.oscillators):
+                osc_phase[i, j] = o.phase
+            pink[i] = v.noise._pink
+            ladder[i] = v.moog_filter._state
+            velocity[i] = v.velocity
+            fade[i] = v.fade
+            base_freq[i] = v._base_freq
+        if noise is not None:
+            white = noise.reshape(1, n_samples)  # the kernel adds this row to every voice
+        elif patch.noise.level > 0.0:
+            white = uniform_noise(self._white(n_voices * n_samples)[0], self.rng).reshape(n_voices, n_samples)
+        else:
+            white = self._no_white
+        osc_wave, osc_ratio, osc_level = fused.pack_oscillators(patch, NUM_OSCILLATORS, self._osc)
+        params = fused.pack_params(patch, self._params)
+        work = self._kernel_work(max(n_samples, NUM_OSCILLATORS))
+
+        fused.render_voices_fused(
+            out, n_voices, params, TABLE_STACK, MIP_EDGES, osc_wave, osc_ratio, osc_level,
+            amp_state, amp_level, filt_state, filt_level, lfo_phase,
+            glide_cur, glide_tgt, osc_phase, pink, ladder, white,
+            velocity, fade, CULL_FADE, base_freq, live, peak, work, GAIN_TABLE, self._ladder_matrix,
+            float(SAMPLE_RATE), A4_FREQ,
+        )
+
+        for i, v in enumerate(voices):
+            _store_env(v.amp_env, amp_state[i], amp_level[i])
+            if not live[i]:
+                v.active = False
+                continue
+            # Voices retired after rendering this block keep their state, as in
+            # the per-voice path
+            if v.fade:
+                v.fade = max(v.fade - n_samples, 0)
+                if not v.fade:
+                    v.active = False
+            if amp_state[i] == RELEASE and peak[i] < silence:
+                v.active = False
+            _store_env(v.filter_env, filt_state[i], filt_level[i])
+            if patch.lfo.depth > 0.0 and shared_lfo_phase is None:
+                v.lfo._phase = float(lfo_phase[i])
+            v.glide._current_freq = float(glide_cur[i])
+            for j, osc in enumerate(v.oscillators):
+                osc.phase = float(osc_phase[i, j])
+            v.moog_filter._state[:] = ladder[i]
+            v.noise._pink[:] = pink[i]
+        return out
@@ -0,0 +1,12 @@
+import wave
+import numpy as np
+
+
+def write_wav(path: str, samples: np.ndarray, sample_rate: int):
+    """Write mono float samples (-1..+1) as a 16-bit PCM WAV file."""
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767.0).astype("<i2")
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(pcm.tobytes())
@@ -850,11 +850,11 @@ class SynthGUI(tk.Tk):
     # ── Engine interaction ──────────────────────────────────────────
 
     def _play_note(self, note, velocity=100):
-        self.engine.channels[self.current_channel].note_on(note, velocity)
-        self._update_voices_display()
+        self.engine.send_note_on(self.current_channel, note, velocity)
+        self.after(20, self._update_voices_display)
 
     def _stop_note(self, note):
-        self.engine.channels[self.current_channel].note_off(note)
+        self.engine.send_note_off(self.current_channel, note)
         self.after(50, self._update_voices_display)
 
     def _set_param(self, param, value):
@@ -963,6 +963,6 @@ class SynthGUI(tk.Tk):
         self._voice_update_id = self.after(200, self._update_voices_display)
 
     def _on_close(self):
-        for ch in self.engine.channels:
-            ch.all_notes_off()
+        for i in range(len(self.engine.channels)):
+            self.engine.send_cc(i, 123, 0)  # All Notes Off
         self.destroy()
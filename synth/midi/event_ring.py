@@ -0,0 +1,95 @@
+import numpy as np
+from ..config import MIDI_QUEUE_SIZE
+from .event_types import EV_NOTE_ON, EV_NOTE_OFF, EV_CONTROL_CHANGE, EV_PITCHWHEEL, EVENT_TYPES  # noqa: F401
+
+# Fixed-size event record; data1/data2 are note/velocity, control/value or pitch/0
+EVENT_DTYPE = np.dtype([
+    ("type", np.uint8),
+    ("channel", np.uint8),
+    ("data1", np.int16),
+    ("data2", np.int16),
+    ("timestamp", np.float64),
+])
+
+
+def encode_message(msg: dict) -> tuple[int, int, int, int] | None:
+    """Convert a message dict ({"type": "note_on", ...}) to (type, channel, data1, data2)."""
+    msg_type = msg.get("type")
+    ch = msg.get("channel", 0)
+    if msg_type in ("note_on", "note_off"):
+        return EVENT_TYPES[msg_type], ch, msg["note"], msg.get("velocity", 0)
+    elif msg_type == "control_change":
+        return EV_CONTROL_CHANGE, ch, msg["control"], msg["value"]
+    elif msg_type == "pitchwheel":
+        return EV_PITCHWHEEL, ch, msg["pitch"], 0
+    return None
+
+
+class EventRing:
+    """Preallocated single-producer/single-consumer ring of MIDI event records.
+
+    One thread pushes, one thread (the audio callback) drains. The producer
+    writes the record before publishing the new write index, so the consumer
+    never sees a half-written event. When the ring is full new events are
+    dropped and counted instead of silently overwriting older ones.
+    """
+
+    def __init__(self, capacity: int = MIDI_QUEUE_SIZE):
+        size = 1
+        while size < capacity:
+            size <<= 1
+        self.capacity = size
+        self._mask = size - 1
+        self._buf = np.zeros(size, dtype=EVENT_DTYPE)
+        self._write = 0  # only the producer advances this
+        self._read = 0   # only the consumer advances this
+        self.pushed = 0
+        self.dropped = 0
+        self.high_water = 0
+
+    def push(self, ev_type: int, channel: int, data1: int, data2: int, timestamp: float = 0.0) -> bool:
+        """Producer side. Returns False (and counts a drop) when the ring is full."""
+        w = self._write
+        pending = w - self._read
+        if pending >= self.capacity:
+            self.dropped += 1
+            return False
+        self._buf[w & self._mask] = (ev_type, channel, data1, data2, timestamp)
+        self._write = w + 1
+        self.pushed += 1
+        if pending + 1 > self.high_water:
+            self.high_water = pending + 1
+        return True
+
+    def push_message(self, msg: dict, timestamp: float = 0.0) -> bool:
+        """Producer side, for message dicts in the mido-like format."""
+        ev = encode_message(msg)
+        if ev is None:
+            return False
+        return self.push(*ev, timestamp)
+
+    def drain_into(self, dest: np.ndarray) -> int:
+        """Consumer side: copy pending events into `dest` (an EVENT_DTYPE array).
+
+        Copies at most len(dest) records with slice assignment — no per-event
+        objects — and returns how many were copied.
+        """
+        r = self._read
+        n = min(self._write - r, len(dest))
+        if n <= 0:
+            return 0
+        start = r & self._mask
+        first = min(n, self.capacity - start)
+        dest[:first] = self._buf[start:start + first]
+        if n > first:
+            dest[first:n] = self._buf[:n - first]
+        self._read = r + n
+        return n
+
+    def __len__(self) -> int:
+        return self._write - self._read
+
+    def stats(self) -> dict:
+        return {"pushed": self.pushed, "dropped": self.dropped,
+                "pending": len(self), "high_water": self.high_water,
+                "capacity": self.capacity}
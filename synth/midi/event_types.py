@@ -0,0 +1,12 @@
+# Event types (kept apart from event_ring so MIDI port code loads without numpy)
+EV_NOTE_ON = 1
+EV_NOTE_OFF = 2
+EV_CONTROL_CHANGE = 3
+EV_PITCHWHEEL = 4
+
+EVENT_TYPES = {
+    "note_on": EV_NOTE_ON,
+    "note_off": EV_NOTE_OFF,
+    "control_change": EV_CONTROL_CHANGE,
+    "pitchwheel": EV_PITCHWHEEL,
+}
@@ -1,30 +1,46 @@
 import threading
-import collections
 import os
-import mido
+import time
+from importlib.util import find_spec
+from typing import TYPE_CHECKING
+from .event_types import EV_NOTE_ON, EV_NOTE_OFF, EV_CONTROL_CHANGE, EV_PITCHWHEEL
 
-# Use pygame backend if rtmidi is not available
-try:
-    import rtmidi  # noqa: F401
-except ImportError:
-    os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
-    os.environ.setdefault("MIDO_BACKEND", "mido.backends.pygame")
-    mido.set_backend("mido.backends.pygame")
+if TYPE_CHECKING:
+    from .event_ring import EventRing  # (numpy: only the engine needs it)
+
+# mido is imported on first use (port listing or opening), not with the package
+HAS_MIDO = find_spec("mido") is not None
+_mido = None
+
+
+def _load_mido():
+    global _mido
+    if _mido is None:
+        import mido
+        # Use pygame backend if rtmidi is not available
+        try:
+            import rtmidi  # noqa: F401
+        except ImportError:
+            os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+            os.environ.setdefault("MIDO_BACKEND", "mido.backends.pygame")
+            mido.set_backend("mido.backends.pygame")
+        _mido = mido
+    return _mido
 
 
 class MidiInput:
-    """Listens on a MIDI port and pushes messages to a shared deque."""
+    """Listens on a MIDI port and pushes events into the engine's MIDI ring."""
 
-    def __init__(self, queue: collections.deque):
-        self._queue = queue
-        self._port: mido.ports.BaseInput | None = None
+    def __init__(self, ring: "EventRing"):
+        self._ring = ring
+        self._port = None  # mido input port
         self._thread: threading.Thread | None = None
         self._running = False
 
     @staticmethod
     def list_ports() -> list[str]:
         try:
-            return mido.get_input_names()
+            return _load_mido().get_input_names()
         except Exception:
             return []
 
@@ -34,7 +50,7 @@ class MidiInput:
             if not ports:
                 raise RuntimeError("No MIDI input ports available")
             port_name = ports[0]
-        self._port = mido.open_input(port_name)
+        self._port = _load_mido().open_input(port_name)
         self._running = True
         self._thread = threading.Thread(target=self._listener, daemon=True)
         self._thread.start()
@@ -54,27 +70,23 @@ class MidiInput:
                 for msg in self._port.iter_pending():
                     parsed = self._parse(msg)
                     if parsed:
-                        self._queue.append(parsed)
-                import time
+                        self._ring.push(*parsed, time.monotonic())
                 time.sleep(0.001)  # ~1ms poll
             except Exception:
                 if not self._running:
                     break
 
     @staticmethod
-    def _parse(msg: mido.Message) -> dict | None:
+    def _parse(msg) -> tuple[int, int, int, int] | None:
+        """mido message → (event type, channel, data1, data2)."""
         if msg.type == "note_on":
-            return {"type": "note_on", "channel": msg.channel,
-                    "note": msg.note, "velocity": msg.velocity}
+            return EV_NOTE_ON, msg.channel, msg.note, msg.velocity
         elif msg.type == "note_off":
-            return {"type": "note_off", "channel": msg.channel,
-                    "note": msg.note, "velocity": msg.velocity}
+            return EV_NOTE_OFF, msg.channel, msg.note, msg.velocity
         elif msg.type == "control_change":
-            return {"type": "control_change", "channel": msg.channel,
-                    "control": msg.control, "value": msg.value}
+            return EV_CONTROL_CHANGE, msg.channel, msg.control, msg.value
         elif msg.type == "pitchwheel":
-            return {"type": "pitchwheel", "channel": msg.channel,
-                    "pitch": msg.pitch}
+            return EV_PITCHWHEEL, msg.channel, msg.pitch, 0
         return None
 
     @property
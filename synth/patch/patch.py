@@ -16,6 +16,7 @@ class OscParams:
 class NoiseParams:
     noise_type: str = "white"
     level: float = 0.0
+    shared: bool = False     # one noise stream per channel instead of one per voice
 
 
 @dataclass
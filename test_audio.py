@@ -6,20 +6,16 @@ from synth.patch.default_patches import DEFAULT_PATCHES
 
 
 def play_note(engine, channel, note, velocity, duration):
-    engine.midi_queue.append({
-        "type": "note_on", "channel": channel, "note": note, "velocity": velocity,
-    })
+    engine.send_note_on(channel, note, velocity)
     time.sleep(duration)
-    engine.midi_queue.append({
-        "type": "note_off", "channel": channel, "note": note, "velocity": 0,
-    })
+    engine.send_note_off(channel, note)
 
 
 def main():
     engine = AudioEngine()
 
-    # Load Bass Moog on channel 0
-    engine.channels[0].set_patch(DEFAULT_PATCHES["Bass Moog"].copy())
+    # Load Bass Voog on channel 0
+    engine.channels[0].set_patch(DEFAULT_PATCHES["Bass Voog"].copy())
     # Load Lead Saw on channel 1
     engine.channels[1].set_patch(DEFAULT_PATCHES["Lead Saw"].copy())
     # Load Pad Strings on channel 2
@@ -30,7 +26,7 @@ def main():
     time.sleep(0.3)
 
     # --- Bass line ---
-    print(">> Bass Moog (channel 1)")
+    print(">> Bass Voog (channel 1)")
     for note in [36, 36, 39, 41, 36, 36, 43, 41]:
         play_note(engine, 0, note, 100, 0.3)
         time.sleep(0.05)
@@ -51,14 +47,10 @@ def main():
     print(">> Pad Strings chord (channel 3)")
     chord = [60, 64, 67, 72]
     for n in chord:
-        engine.midi_queue.append({
-            "type": "note_on", "channel": 2, "note": n, "velocity": 80,
-        })
+        engine.send_note_on(2, n, 80)
     time.sleep(3.0)
     for n in chord:
-        engine.midi_queue.append({
-            "type": "note_off", "channel": 2, "note": n, "velocity": 0,
-        })
+        engine.send_note_off(2, n)
     time.sleep(2.0)  # Let the release tail ring out
 
     print("Demo complete.")